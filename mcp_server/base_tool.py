@@ -3,6 +3,7 @@ Enhanced MCP Base Tool with circuit breaker, metrics, and advanced error handlin
 Production-ready implementation with proper async support, validation, and resource limits.
 """
 import asyncio
+import ipaddress
 import logging
 import os
 import re
@@ -18,8 +19,8 @@ import math
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import ClassVar, Optional, Sequence, Dict, Any
-from datetime import datetime, timedelta
+from typing import ClassVar, Optional, Sequence, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone
 
 try:
     from pydantic import BaseModel, Field
@@ -81,8 +82,19 @@ _semaphore_registry = {}
 
 
 def _is_private_or_lab(value: str) -> bool:
-    """Enhanced validation with hostname format checking."""
-    import ipaddress
+    """
+    Enhanced validation with hostname format checking.
+    
+    A comma/whitespace separated target list is valid when every entry is.
+    """
+    if "," in value or len(value.split()) > 1:
+        entries = value.replace(",", " ").split()
+        return bool(entries) and all(_is_private_or_lab_entry(entry) for entry in entries)
+    return _is_private_or_lab_entry(value)
+
+
+def _is_private_or_lab_entry(value: str) -> bool:
+    """Validate a single RFC1918 IPv4 address, CIDR range or .lab.internal hostname."""
     v = value.strip()
     
     # Validate .lab.internal hostname format
@@ -103,6 +115,22 @@ def _is_private_or_lab(value: str) -> bool:
         return False
 
 
+# (level, message, args) of a policy decision, recorded by memoized validators
+_AuditEvent = Tuple[int, str, Tuple[Any, ...]]
+
+
+def _log_audit(logger: logging.Logger, events: Sequence[_AuditEvent]) -> None:
+    """
+    Emit recorded policy decisions.
+    
+    Callers replay events on every request, including cache hits and
+    validation failures (which are never cached), so each request leaves
+    an audit trail.
+    """
+    for level, message, args in events:
+        logger.log(level, message, *args)
+
+
 class ToolErrorType(Enum):
     """Tool error types."""
     TIMEOUT = "timeout"
@@ -116,14 +144,26 @@ class ToolErrorType(Enum):
 
 @dataclass
 class ErrorContext:
-    """Error context with recovery suggestions."""
+    """
+    Error context with recovery suggestions.
+    
+    When no timestamp is supplied, only time.time_ns() is captured at
+    construction; the UTC datetime is built on first use.
+    """
     error_type: ToolErrorType
     message: str
     recovery_suggestion: str
-    timestamp: datetime
     tool_name: str
     target: str
+    timestamp: Optional[datetime] = None
     metadata: Dict[str, Any] = field(default_factory=dict)
+    _created_ns: int = field(default_factory=time.time_ns, init=False, repr=False)
+
+    def get_timestamp(self) -> datetime:
+        """Return the error timestamp, materializing it from the capture time if needed."""
+        if self.timestamp is None:
+            self.timestamp = datetime.fromtimestamp(self._created_ns / 1e9, tz=timezone.utc)
+        return self.timestamp
 
 
 class ToolInput(BaseModel):
@@ -139,7 +179,7 @@ class ToolInput(BaseModel):
             @field_validator("target", mode='after')
             def _validate_target(cls, v: str) -> str:
                 if not _is_private_or_lab(v):
-                    raise ValueError("Target must be RFC1918 IPv4 or a .lab.internal hostname (CIDR allowed).")
+                    raise ValueError("Target must be RFC1918 IPv4 or a .lab.internal hostname (CIDR and target lists allowed).")
                 return v
             
             @classmethod
@@ -155,7 +195,7 @@ class ToolInput(BaseModel):
             @field_validator("target")
             def _validate_target(cls, v: str) -> str:
                 if not _is_private_or_lab(v):
-                    raise ValueError("Target must be RFC1918 IPv4 or a .lab.internal hostname (CIDR allowed).")
+                    raise ValueError("Target must be RFC1918 IPv4 or a .lab.internal hostname (CIDR and target lists allowed).")
                 return v
             
             @field_validator("extra_args")
@@ -388,6 +428,11 @@ class MCPBaseTool(ABC):
     
     async def _execute_tool(self, inp: ToolInput, timeout_sec: Optional[float] = None) -> ToolOutput:
         """Execute the tool with validation and resource limits."""
+        return await self._execute_command(inp, (inp.target,), timeout_sec)
+    
+    async def _execute_command(self, inp: ToolInput, target_argv: Sequence[str],
+                               timeout_sec: Optional[float] = None) -> ToolOutput:
+        """Validate inp.extra_args and spawn the command with target_argv appended."""
         resolved_cmd = self._resolve_command()
         if not resolved_cmd:
             error_context = ErrorContext(
@@ -415,7 +460,7 @@ class MCPBaseTool(ABC):
             )
             return self._create_error_output(error_context, inp.correlation_id or "")
         
-        cmd = [resolved_cmd] + list(args) + [inp.target]
+        cmd = [resolved_cmd] + list(args) + list(target_argv)
         timeout = float(timeout_sec or inp.timeout_sec or self.default_timeout_sec)
         return await self._spawn(cmd, timeout)
     
@@ -440,7 +485,7 @@ class MCPBaseTool(ABC):
             correlation_id=correlation_id,
             metadata={
                 "recovery_suggestion": error_context.recovery_suggestion,
-                "timestamp": error_context.timestamp.isoformat(),
+                "timestamp": error_context.get_timestamp().isoformat(),
                 **error_context.metadata
             }
         )
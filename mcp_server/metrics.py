@@ -7,26 +7,32 @@ import time
 import logging
 import threading
 import math
-from typing import Dict, Any, Optional, Set, List
+import sys
+import weakref
+from typing import Dict, Any, Optional, Set, List, Tuple
 from datetime import datetime, timedelta
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
-from collections import deque
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
 
 log = logging.getLogger(__name__)
 
+# Bound once; checked on every recorded execution
+_isfinite = math.isfinite
+
 
 class PrometheusRegistry:
-    """Enhanced singleton registry with safer metric detection."""
-    _instance = None
-    _lock = threading.Lock()
-    
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
+    """Registry with safer metric detection; the module creates one instance at import."""
+    
+    def __init__(self):
+        self._initialized = False
+        self._lock = threading.Lock()
     
     def initialize(self):
         """Initialize Prometheus metrics once with safer detection."""
@@ -131,45 +137,138 @@ class PrometheusRegistry:
 _prometheus_registry = PrometheusRegistry()
 _prometheus_registry.initialize()
 
+# Collector handles bound once at import so recording never goes through the singleton
+if _prometheus_registry.available:
+    _EXEC_COUNTER = _prometheus_registry.execution_counter
+    _EXEC_HISTOGRAM = _prometheus_registry.execution_histogram
+    _ACTIVE_GAUGE = _prometheus_registry.active_gauge
+    _ERROR_COUNTER = _prometheus_registry.error_counter
+else:
+    _EXEC_COUNTER = _EXEC_HISTOGRAM = _ACTIVE_GAUGE = _ERROR_COUNTER = None
+
+
+# Size of the per-tool window used for percentiles and recent failure rate
+_RECENT_WINDOW = 100
+
+
+def _percentile_indices(n: int) -> Tuple[int, int, int]:
+    """Nearest-rank positions of p50/p95/p99 in a sorted sample of size n."""
+    return n // 2, min(int(n * 0.95), n - 1), min(int(n * 0.99), n - 1)
+
+
+class _RecentWindow:
+    """
+    Fixed-size ring of recent execution times and outcomes stored as parallel
+    arrays (NumPy when available, plain lists otherwise). Not thread-safe;
+    callers hold the owning metrics lock.
+    """
+    __slots__ = ("_times", "_success", "_head", "_filled", "_size")
+    
+    def __init__(self, size: int = _RECENT_WINDOW):
+        if NUMPY_AVAILABLE:
+            self._times = np.zeros(size, dtype=np.float64)
+            self._success = np.zeros(size, dtype=bool)
+        else:
+            self._times = [0.0] * size
+            self._success = [False] * size
+        self._size = size
+        self._head = 0
+        self._filled = 0
+    
+    def __len__(self) -> int:
+        return self._filled
+    
+    def append(self, execution_time: float, success: bool):
+        """Overwrite the oldest slot with a new sample."""
+        head = self._head
+        self._times[head] = execution_time
+        self._success[head] = success
+        self._head = (head + 1) % self._size
+        if self._filled < self._size:
+            self._filled += 1
+    
+    def percentiles(self) -> Tuple[float, float, float]:
+        """Return (p50, p95, p99) using nearest-rank indices over the window."""
+        n = self._filled
+        if n == 0:
+            return 0.0, 0.0, 0.0
+        indices = _percentile_indices(n)
+        if NUMPY_AVAILABLE:
+            # O(n) selection instead of a full sort
+            ordered = np.partition(self._times[:n], indices)
+            return float(ordered[indices[0]]), float(ordered[indices[1]]), float(ordered[indices[2]])
+        ordered = sorted(self._times[:n])
+        return ordered[indices[0]], ordered[indices[1]], ordered[indices[2]]
+    
+    def failure_rate(self) -> float:
+        """Percentage of failed executions in the window."""
+        n = self._filled
+        if n == 0:
+            return 0.0
+        if NUMPY_AVAILABLE:
+            successes = int(np.count_nonzero(self._success[:n]))
+        else:
+            successes = sum(self._success[:n])
+        return (n - successes) / n * 100
+
+
+def _monotonic_to_datetime(stamp_ns: int) -> datetime:
+    """Convert a time.monotonic_ns() stamp to the matching local wall-clock time."""
+    return datetime.now() - timedelta(microseconds=(time.monotonic_ns() - stamp_ns) / 1000)
+
 
 @dataclass
 class ToolExecutionMetrics:
-    """Thread-safe tool execution metrics with edge case handling."""
+    """
+    Thread-safe tool execution metrics with edge case handling.
+    
+    One lock guards the counters and the recent-executions window, so a record
+    is a single short critical section and a read sees a consistent view of
+    both. Percentiles cover the last _RECENT_WINDOW executions.
+    """
     tool_name: str
-    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False)
-    execution_count: int = 0
-    success_count: int = 0
-    failure_count: int = 0
-    timeout_count: int = 0
-    error_count: int = 0
-    total_execution_time: float = 0.0
-    min_execution_time: float = float('inf')
-    max_execution_time: float = 0.0
-    last_execution_time: Optional[datetime] = None
-    recent_executions: deque = field(default_factory=lambda: deque(maxlen=100))
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    execution_count: int = field(default=0, init=False)
+    success_count: int = field(default=0, init=False)
+    failure_count: int = field(default=0, init=False)
+    timeout_count: int = field(default=0, init=False)
+    error_count: int = field(default=0, init=False)
+    total_execution_time: float = field(default=0.0, init=False)
+    min_execution_time: float = field(default=0.0, init=False)
+    max_execution_time: float = field(default=0.0, init=False)
+    # time.monotonic_ns() of the last execution; wall-clock time is derived lazily
+    _last_execution_ns: Optional[int] = field(default=None, init=False, repr=False)
+    _recent: _RecentWindow = field(default_factory=_RecentWindow, init=False, repr=False)
+    _cached_iso: Tuple[Optional[int], Optional[str]] = field(
+        default=(None, None), init=False, repr=False
+    )
     
     def record_execution(self, success: bool, execution_time: float, 
                          timed_out: bool = False, error_type: Optional[str] = None):
         """Thread-safe execution recording with validation."""
+        # Sanitize execution_time
+        if not _isfinite(execution_time):
+            log.warning("metrics.invalid_execution_time time=%s tool=%s", 
+                       execution_time, self.tool_name)
+            execution_time = 0.0
+        
+        execution_time = max(0.0, float(execution_time))
+        
+        self._record_execution_prevalidated(success, execution_time, timed_out, error_type)
+    
+    def _record_execution_prevalidated(self, success: bool, execution_time: float,
+                                       timed_out: bool, error_type: Optional[str]):
+        """Record an execution whose time is already a finite, non-negative float."""
+        stamp = time.monotonic_ns()
         with self._lock:
-            # Sanitize execution_time
-            if math.isnan(execution_time) or math.isinf(execution_time):
-                log.warning("metrics.invalid_execution_time time=%s tool=%s", 
-                           execution_time, self.tool_name)
-                execution_time = 0.0
-            
-            execution_time = max(0.0, float(execution_time))
-            
-            self.execution_count += 1
-            self.total_execution_time += execution_time
-            
-            # Handle min/max with infinity edge case
-            if self.min_execution_time == float('inf') or execution_time < self.min_execution_time:
+            if self.execution_count == 0:
+                self.min_execution_time = self.max_execution_time = execution_time
+            elif execution_time < self.min_execution_time:
                 self.min_execution_time = execution_time
-            if execution_time > self.max_execution_time:
+            elif execution_time > self.max_execution_time:
                 self.max_execution_time = execution_time
-            
-            self.last_execution_time = datetime.now()
+            self.execution_count += 1
+            self.total_execution_time += execution_time
             
             if success:
                 self.success_count += 1
@@ -181,99 +280,238 @@ class ToolExecutionMetrics:
             if timed_out:
                 self.timeout_count += 1
             
-            self.recent_executions.append({
-                "timestamp": datetime.now(),
-                "success": success,
-                "execution_time": execution_time,
-                "timed_out": timed_out,
-                "error_type": error_type
-            })
+            self._last_execution_ns = stamp
+            self._recent.append(execution_time, success)
     
-    def get_stats(self) -> Dict[str, Any]:
-        """Get thread-safe statistics snapshot with proper edge case handling."""
-        with self._lock:
-            if self.execution_count == 0:
-                return {
-                    "tool_name": self.tool_name,
-                    "execution_count": 0,
-                    "success_rate": 0.0,
-                    "average_execution_time": 0.0,
-                    "min_execution_time": 0.0,
-                    "max_execution_time": 0.0,
-                    "p50_execution_time": 0.0,
-                    "p95_execution_time": 0.0,
-                    "p99_execution_time": 0.0,
-                }
-            
-            recent_times = sorted([
-                e["execution_time"] for e in self.recent_executions
-                if e["execution_time"] is not None and not math.isnan(e["execution_time"])
-            ])
-            
-            if recent_times:
-                p50_idx = len(recent_times) // 2
-                p95_idx = min(int(len(recent_times) * 0.95), len(recent_times) - 1)
-                p99_idx = min(int(len(recent_times) * 0.99), len(recent_times) - 1)
-                
-                p50 = recent_times[p50_idx]
-                p95 = recent_times[p95_idx]
-                p99 = recent_times[p99_idx]
-            else:
-                p50 = p95 = p99 = 0.0
-            
-            avg_execution_time = self.total_execution_time / self.execution_count
-            success_rate = (self.success_count / self.execution_count) * 100
-            
-            min_time = 0.0 if self.min_execution_time == float('inf') else self.min_execution_time
-            
+    def _totals_locked(self) -> Dict[str, Any]:
+        """Copy the counters. Caller holds _lock."""
+        return {
+            "execution_count": self.execution_count,
+            "success_count": self.success_count,
+            "failure_count": self.failure_count,
+            "error_count": self.error_count,
+            "timeout_count": self.timeout_count,
+            "total_execution_time": self.total_execution_time,
+            "min_execution_time": self.min_execution_time,
+            "max_execution_time": self.max_execution_time,
+        }
+    
+    def _counters_from(self, totals: Dict[str, Any]) -> Dict[str, Any]:
+        """Format copied counter totals as the counter section of the stats."""
+        execution_count = totals["execution_count"]
+        if execution_count == 0:
             return {
                 "tool_name": self.tool_name,
-                "execution_count": self.execution_count,
-                "success_count": self.success_count,
-                "failure_count": self.failure_count,
-                "error_count": self.error_count,
-                "timeout_count": self.timeout_count,
-                "success_rate": round(success_rate, 2),
-                "average_execution_time": round(avg_execution_time, 4),
-                "min_execution_time": round(min_time, 4),
-                "max_execution_time": round(self.max_execution_time, 4),
-                "p50_execution_time": round(p50, 4),
-                "p95_execution_time": round(p95, 4),
-                "p99_execution_time": round(p99, 4),
-                "last_execution_time": self.last_execution_time.isoformat() if self.last_execution_time else None,
-                "recent_failure_rate": self._calculate_recent_failure_rate(),
+                "execution_count": 0,
+                "success_rate": 0.0,
+                "average_execution_time": 0.0,
+                "min_execution_time": 0.0,
+                "max_execution_time": 0.0,
             }
+        
+        return {
+            "tool_name": self.tool_name,
+            "execution_count": execution_count,
+            "success_count": totals["success_count"],
+            "failure_count": totals["failure_count"],
+            "error_count": totals["error_count"],
+            "timeout_count": totals["timeout_count"],
+            "success_rate": (totals["success_count"] / execution_count) * 100,
+            "average_execution_time": totals["total_execution_time"] / execution_count,
+            "min_execution_time": totals["min_execution_time"],
+            "max_execution_time": totals["max_execution_time"],
+        }
+    
+    def get_counters(self) -> Dict[str, Any]:
+        """
+        Get counter and aggregate timing fields only.
+        
+        Skips the recent window and histogram, so it is cheap enough for
+        scrapes that do not need percentiles.
+        """
+        with self._lock:
+            totals = self._totals_locked()
+        return self._counters_from(totals)
+    
+    def _percentiles_locked(self) -> Tuple[float, float, float]:
+        """Read (p50, p95, p99) from the recent window. Caller holds _lock."""
+        return self._recent.percentiles()
+    
+    def get_percentiles(self) -> Dict[str, float]:
+        """Get p50/p95/p99 execution times over the recent window."""
+        with self._lock:
+            p50, p95, p99 = self._percentiles_locked()
+        return {
+            "p50_execution_time": p50,
+            "p95_execution_time": p95,
+            "p99_execution_time": p99,
+        }
+    
+    def snapshot(self, defer_window: bool = False) -> tuple:
+        """
+        Copy the raw state needed for get_stats under a single lock acquisition.
+        
+        Returns (totals, percentiles, window, recent_failure_rate, last_execution_ns).
+        With ``defer_window`` and NumPy available, a full recent window is returned
+        as a copied array with percentiles set to None so the caller can batch the
+        selection across tools; otherwise window is None.
+        """
+        window = None
+        with self._lock:
+            totals = self._totals_locked()
+            if defer_window and NUMPY_AVAILABLE and len(self._recent) == _RECENT_WINDOW:
+                window = self._recent._times.copy()
+                percentiles = None
+            else:
+                percentiles = self._percentiles_locked()
+            recent_failure_rate = self._calculate_recent_failure_rate()
+            last_execution_ns = self._last_execution_ns
+        return totals, percentiles, window, recent_failure_rate, last_execution_ns
+    
+    def format_snapshot(self, snapshot: tuple,
+                        precomputed: Optional[Tuple[float, float, float]] = None) -> Dict[str, Any]:
+        """Build the get_stats dict from a snapshot, outside any lock."""
+        totals, percentiles, _, recent_failure_rate, last_execution_ns = snapshot
+        stats = self._counters_from(totals)
+        if stats["execution_count"] == 0:
+            stats.update(p50_execution_time=0.0, p95_execution_time=0.0, p99_execution_time=0.0)
+            return stats
+        
+        p50, p95, p99 = precomputed if precomputed is not None else percentiles
+        stats["p50_execution_time"] = p50
+        stats["p95_execution_time"] = p95
+        stats["p99_execution_time"] = p99
+        stats["last_execution_time"] = self._last_execution_iso(last_execution_ns)
+        stats["recent_failure_rate"] = recent_failure_rate
+        return stats
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get thread-safe statistics snapshot with proper edge case handling.
+        
+        Values are returned unrounded; formatting is left to the serializer.
+        """
+        return self.format_snapshot(self.snapshot())
     
     def _calculate_recent_failure_rate(self) -> float:
         """Calculate failure rate from recent executions."""
-        if not self.recent_executions:
-            return 0.0
-        
-        recent_failures = sum(
-            1 for e in self.recent_executions if not e["success"]
-        )
-        return round((recent_failures / len(self.recent_executions)) * 100, 2)
+        return self._recent.failure_rate()
+    
+    @property
+    def last_execution_ns(self) -> Optional[int]:
+        """Monotonic timestamp (ns) of the last execution, or None."""
+        return self._last_execution_ns
+    
+    @property
+    def last_execution_time(self) -> Optional[datetime]:
+        """Wall-clock time of the last execution, derived from the monotonic stamp."""
+        stamp = self._last_execution_ns
+        return None if stamp is None else _monotonic_to_datetime(stamp)
+    
+    def _last_execution_iso(self, stamp: Optional[int]) -> Optional[str]:
+        """Format a monotonic execution stamp, reusing the string while it is unchanged."""
+        if stamp is None:
+            return None
+        cached_stamp, cached_iso = self._cached_iso
+        if cached_stamp != stamp:
+            cached_iso = _monotonic_to_datetime(stamp).isoformat()
+            self._cached_iso = (stamp, cached_iso)
+        return cached_iso
+
+
+class _ThreadCounters:
+    """Request/error tallies written only by their owning thread."""
+    __slots__ = ("requests", "errors", "owner")
+    
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.owner = weakref.ref(threading.current_thread())
+
+
+def _batch_window_percentiles(windows: List[Any]) -> Dict[int, Tuple[float, float, float]]:
+    """
+    Compute percentiles for every deferred recent window in a single NumPy pass.
+    
+    ``windows`` holds the window entry of each tool snapshot (None when the tool
+    already computed its own percentiles). Returns list position -> (p50, p95, p99).
+    """
+    positions = [position for position, window in enumerate(windows) if window is not None]
+    if not positions:
+        return {}
+    
+    indices = _percentile_indices(_RECENT_WINDOW)
+    rows = np.stack([windows[position] for position in positions])
+    selected = np.partition(rows, indices, axis=1)[:, indices]
+    return {
+        position: (float(row[0]), float(row[1]), float(row[2]))
+        for position, row in zip(positions, selected)
+    }
 
 
 class SystemMetrics:
-    """System-wide metrics tracking."""
+    """
+    System-wide metrics tracking.
+    
+    Request and error counts are bumped on per-thread tallies without taking
+    the shared lock; readers sum the registered tallies under the lock and
+    fold those of exited threads into the retired totals.
+    """
     
     def __init__(self):
         self.start_time = datetime.now()
-        self.request_count = 0
-        self.error_count = 0
+        self._start_monotonic = time.monotonic()
         self.active_connections = 0
         self._lock = threading.Lock()
+        self._local = threading.local()
+        self._thread_counters: List[_ThreadCounters] = []
+        self._retired_requests = 0
+        self._retired_errors = 0
+    
+    def _counters(self) -> _ThreadCounters:
+        """Return this thread's tallies, registering them on first use."""
+        counters = getattr(self._local, "counters", None)
+        if counters is None:
+            counters = _ThreadCounters()
+            self._local.counters = counters
+            with self._lock:
+                self._thread_counters.append(counters)
+        return counters
+    
+    def _collect(self) -> Tuple[int, int]:
+        """Sum all tallies, retiring those of dead threads. Caller holds _lock."""
+        requests = self._retired_requests
+        errors = self._retired_errors
+        live = []
+        for counters in self._thread_counters:
+            requests += counters.requests
+            errors += counters.errors
+            owner = counters.owner()
+            if owner is None or not owner.is_alive():
+                self._retired_requests += counters.requests
+                self._retired_errors += counters.errors
+            else:
+                live.append(counters)
+        self._thread_counters = live
+        return requests, errors
+    
+    @property
+    def request_count(self) -> int:
+        with self._lock:
+            return self._collect()[0]
+    
+    @property
+    def error_count(self) -> int:
+        with self._lock:
+            return self._collect()[1]
     
     def increment_request_count(self):
         """Thread-safe request count increment."""
-        with self._lock:
-            self.request_count += 1
+        self._counters().requests += 1
     
     def increment_error_count(self):
         """Thread-safe error count increment."""
-        with self._lock:
-            self.error_count += 1
+        self._counters().errors += 1
     
     def increment_active_connections(self):
         """Thread-safe active connections increment."""
@@ -287,24 +525,132 @@ class SystemMetrics:
     
     def get_uptime(self) -> float:
         """Get system uptime in seconds."""
-        return (datetime.now() - self.start_time).total_seconds()
+        return time.monotonic() - self._start_monotonic
     
     def get_stats(self) -> Dict[str, Any]:
         """Get system statistics."""
         with self._lock:
             uptime = self.get_uptime()
-            error_rate = (self.error_count / self.request_count * 100) if self.request_count > 0 else 0
+            request_count, error_count = self._collect()
+            error_rate = (error_count / request_count * 100) if request_count > 0 else 0
             
             return {
                 "uptime_seconds": uptime,
-                "request_count": self.request_count,
-                "error_count": self.error_count,
+                "request_count": request_count,
+                "error_count": error_count,
                 "error_rate": round(error_rate, 2),
                 "active_connections": self.active_connections,
                 "start_time": self.start_time.isoformat()
             }
 
 
+# Interned Prometheus label values used on every record
+_STATUS_SUCCESS = sys.intern('success')
+_STATUS_FAILURE = sys.intern('failure')
+_ERR_NONE = sys.intern('none')
+
+# Buffered Prometheus updates: batching delay (seconds) and cap on pending entries
+_PROMETHEUS_FLUSH_INTERVAL = 0.1
+_PROMETHEUS_BUFFER_SIZE = 65536
+
+
+class _PrometheusFlusher:
+    """
+    Buffers Prometheus updates from the record path and applies them in
+    batches on a daemon thread, so recorders never touch prometheus_client
+    locks. deque.append/popleft are thread-safe. The thread sleeps until an
+    update is queued; updates arriving while the buffer is full are counted
+    as dropped and reported at the next flush.
+    """
+    
+    def __init__(self):
+        self._pending: deque = deque()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._drop_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._dropped = 0
+        self._dropped_reported = 0
+    
+    @property
+    def dropped(self) -> int:
+        """Total updates discarded because the buffer was full."""
+        return self._dropped
+    
+    def submit(self, tool_metrics: 'ToolMetrics', status: str, error_type: str,
+               execution_time: float, success: bool):
+        """Queue one execution for the next flush."""
+        if len(self._pending) >= _PROMETHEUS_BUFFER_SIZE:
+            with self._drop_lock:
+                self._dropped += 1
+        else:
+            self._pending.append((tool_metrics, status, error_type, execution_time, success))
+        # flush() clears the event before draining, so this append is never stranded
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+        if self._thread is None:
+            self._start()
+    
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name="prometheus-flusher", daemon=True)
+                thread.start()
+                self._thread = thread
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Let a burst accumulate so it is applied as one batch
+            time.sleep(_PROMETHEUS_FLUSH_INTERVAL)
+            self.flush()
+    
+    def flush(self):
+        """Apply all buffered updates, grouping counter increments by label set."""
+        with self._flush_lock:
+            self._wakeup.clear()
+            pending = self._pending
+            counts: Dict[Tuple['ToolMetrics', str, str], int] = {}
+            errors: Dict[Tuple['ToolMetrics', str], int] = {}
+            while pending:
+                tool_metrics, status, error_type, execution_time, success = pending.popleft()
+                key = (tool_metrics, status, error_type)
+                counts[key] = counts.get(key, 0) + 1
+                if not success:
+                    error_key = (tool_metrics, error_type)
+                    errors[error_key] = errors.get(error_key, 0) + 1
+                if tool_metrics._hist_child is not None:
+                    try:
+                        tool_metrics._hist_child.observe(execution_time)
+                    except Exception as e:
+                        log.warning("prometheus.observe_failed tool=%s error=%s", tool_metrics.tool_name, e)
+            
+            if _EXEC_COUNTER is not None:
+                for (tool_metrics, status, error_type), count in counts.items():
+                    try:
+                        tool_metrics._counter_child(status, error_type).inc(count)
+                    except Exception as e:
+                        log.warning("prometheus.counter_failed tool=%s status=%s count=%d error=%s",
+                                    tool_metrics.tool_name, status, count, e)
+            if _ERROR_COUNTER is not None:
+                for (tool_metrics, error_type), count in errors.items():
+                    try:
+                        tool_metrics._error_child(error_type).inc(count)
+                    except Exception as e:
+                        log.warning("prometheus.error_counter_failed tool=%s error_type=%s count=%d error=%s",
+                                    tool_metrics.tool_name, error_type, count, e)
+            
+            dropped = self._dropped
+            if dropped != self._dropped_reported:
+                log.warning("prometheus.updates_dropped count=%d total=%d buffer_size=%d",
+                            dropped - self._dropped_reported, dropped, _PROMETHEUS_BUFFER_SIZE)
+                self._dropped_reported = dropped
+
+
+_prometheus_flusher = _PrometheusFlusher() if _prometheus_registry.available else None
+
+
 class ToolMetrics:
     """Per-tool metrics wrapper with Prometheus integration."""
     
@@ -313,113 +659,142 @@ class ToolMetrics:
         self.metrics = ToolExecutionMetrics(tool_name)
         self._active_count = 0
         self._lock = threading.Lock()
+        
+        # Labelled Prometheus children resolved once; counters are filled lazily per label set
+        self._hist_child = None
+        self._active_child = None
+        try:
+            if _EXEC_HISTOGRAM is not None:
+                self._hist_child = _EXEC_HISTOGRAM.labels(tool=tool_name)
+            if _ACTIVE_GAUGE is not None:
+                self._active_child = _ACTIVE_GAUGE.labels(tool=tool_name)
+        except Exception as e:
+            log.debug("prometheus.label_failed error=%s", str(e))
+        self._counter_children: Dict[Tuple[str, str], Any] = {}
+        self._error_children: Dict[str, Any] = {}
+    
+    def _counter_child(self, status: str, error_type: str):
+        """Return the cached execution counter child for a status/error_type pair."""
+        key = (status, error_type)
+        child = self._counter_children.get(key)
+        if child is None:
+            child = _EXEC_COUNTER.labels(tool=self.tool_name, status=status, error_type=error_type)
+            self._counter_children[key] = child
+        return child
+    
+    def _error_child(self, error_type: str):
+        """Return the cached error counter child for an error_type."""
+        child = self._error_children.get(error_type)
+        if child is None:
+            child = _ERROR_COUNTER.labels(tool=self.tool_name, error_type=error_type)
+            self._error_children[error_type] = child
+        return child
     
     def record_execution(self, success: bool, execution_time: float,
                         timed_out: bool = False, error_type: Optional[str] = None):
         """Record execution with Prometheus metrics."""
-        # Validate and sanitize inputs
-        if math.isnan(execution_time) or math.isinf(execution_time):
+        # Validate and sanitize inputs once; the inner metrics trust them
+        if not _isfinite(execution_time):
+            log.warning("metrics.invalid_execution_time time=%s tool=%s",
+                       execution_time, self.tool_name)
             execution_time = 0.0
         execution_time = max(0.0, float(execution_time))
         
-        self.metrics.record_execution(success, execution_time, timed_out, error_type)
+        self.metrics._record_execution_prevalidated(success, execution_time, timed_out, error_type)
         
-        if _prometheus_registry.available:
-            try:
-                status = 'success' if success else 'failure'
-                error_type = error_type or 'none'
-                
-                if _prometheus_registry.execution_counter:
-                    _prometheus_registry.execution_counter.labels(
-                        tool=self.tool_name,
-                        status=status,
-                        error_type=error_type
-                    ).inc()
-                
-                if _prometheus_registry.execution_histogram:
-                    _prometheus_registry.execution_histogram.labels(
-                        tool=self.tool_name
-                    ).observe(execution_time)
-                
-                if not success and _prometheus_registry.error_counter:
-                    _prometheus_registry.error_counter.labels(
-                        tool=self.tool_name,
-                        error_type=error_type
-                    ).inc()
-                
-            except Exception as e:
-                log.debug("prometheus.record_failed error=%s", str(e))
+        if _prometheus_flusher is not None:
+            status = _STATUS_SUCCESS if success else _STATUS_FAILURE
+            _prometheus_flusher.submit(self, status, error_type or _ERR_NONE, execution_time, success)
     
     def increment_active(self):
         """Increment active execution count."""
         with self._lock:
             self._active_count += 1
-            if _prometheus_registry.available and _prometheus_registry.active_gauge:
-                try:
-                    _prometheus_registry.active_gauge.labels(tool=self.tool_name).inc()
-                except Exception:
-                    pass
+        if self._active_child is not None:
+            try:
+                self._active_child.inc()
+            except Exception:
+                pass
     
     def decrement_active(self):
         """Decrement active execution count."""
         with self._lock:
             self._active_count = max(0, self._active_count - 1)
-            if _prometheus_registry.available and _prometheus_registry.active_gauge:
-                try:
-                    _prometheus_registry.active_gauge.labels(tool=self.tool_name).dec()
-                except Exception:
-                    pass
+        if self._active_child is not None:
+            try:
+                self._active_child.dec()
+            except Exception:
+                pass
     
     def get_stats(self) -> Dict[str, Any]:
         """Get tool statistics."""
         return self.metrics.get_stats()
+    
+    def get_counters(self) -> Dict[str, Any]:
+        """Get tool counters without percentiles."""
+        return self.metrics.get_counters()
+
+
+def _generate_prometheus_bytes() -> Optional[bytes]:
+    """Render the registry in exposition format without decoding it."""
+    if _prometheus_registry.available and _prometheus_registry.generate_latest:
+        # Apply buffered updates first so a scrape never lags the recorders
+        _prometheus_flusher.flush()
+        try:
+            return _prometheus_registry.generate_latest(_prometheus_registry.registry)
+        except Exception as e:
+            log.error("prometheus.generate_metrics_error error=%s", str(e))
+            return None
+    return None
+
+
+# Tools idle for longer than this are dropped by the periodic cleanup
+_STALE_TOOL_NS = 24 * 3600 * 1_000_000_000
 
 
 class MetricsManager:
-    """Enhanced metrics manager with memory management."""
-    
-    _instance = None
-    _lock = threading.Lock()
+    """
+    Enhanced metrics manager with memory management.
     
-    def __new__(cls, max_tools: int = 1000):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
+    The process-wide instance is created at import; use MetricsManager.get().
+    """
     
     def __init__(self, max_tools: int = 1000):
-        if self._initialized:
-            return
-        
-        self.tool_metrics: Dict[str, ToolMetrics] = {}
+        # Ordered least- to most-recently used
+        self.tool_metrics: "OrderedDict[str, ToolMetrics]" = OrderedDict()
         self.system_metrics = SystemMetrics()
         self.max_tools = max_tools
         self._lock = threading.Lock()
-        self._last_cleanup = time.time()
+        self._last_cleanup = time.monotonic()
         self._cleanup_interval = 3600
         self.start_time = datetime.now()
-        self._initialized = True
     
     @classmethod
     def get(cls) -> 'MetricsManager':
-        """Get singleton instance."""
-        if cls._instance is None:
-            cls._instance = cls()
-        return cls._instance
+        """Get the process-wide instance."""
+        return _metrics_manager
     
     def reset(self):
         """Reset all metrics (for testing)."""
         with self._lock:
             self.tool_metrics.clear()
             self.system_metrics = SystemMetrics()
-            self._last_cleanup = time.time()
+            self._last_cleanup = time.monotonic()
     
     def get_tool_metrics(self, tool_name: str) -> ToolMetrics:
         """Get or create tool metrics with cleanup."""
+        # Fast path: existing tools are read without the lock (dict reads are
+        # atomic under the GIL); only inserts and periodic cleanup serialize.
+        metrics = self.tool_metrics.get(tool_name)
+        if metrics is not None and time.monotonic() - self._last_cleanup <= self._cleanup_interval:
+            try:
+                self.tool_metrics.move_to_end(tool_name)
+            except KeyError:
+                pass  # Evicted concurrently; caller still gets a usable instance
+            return metrics
+        
         with self._lock:
-            if time.time() - self._last_cleanup > self._cleanup_interval:
+            if time.monotonic() - self._last_cleanup > self._cleanup_interval:
                 self._cleanup_old_metrics()
             
             if tool_name not in self.tool_metrics:
@@ -427,6 +802,8 @@ class MetricsManager:
                     self._evict_oldest_metrics()
                 
                 self.tool_metrics[tool_name] = ToolMetrics(tool_name)
+            else:
+                self.tool_metrics.move_to_end(tool_name)
             
             return self.tool_metrics[tool_name]
     
@@ -466,58 +843,72 @@ class MetricsManager:
     
     def _cleanup_old_metrics(self):
         """Remove metrics for tools not used recently."""
-        cutoff_time = datetime.now() - timedelta(hours=24)
+        cutoff_ns = time.monotonic_ns() - _STALE_TOOL_NS
         
+        # Walk from the least recently used end and stop at the first fresh tool.
+        # Iterate a snapshot since lock-free lookups may reorder the map.
         to_remove = []
-        for name, metrics in self.tool_metrics.items():
-            last_time = metrics.metrics.last_execution_time
-            if last_time and last_time < cutoff_time:
-                to_remove.append(name)
+        for name, metrics in list(self.tool_metrics.items()):
+            last_ns = metrics.metrics.last_execution_ns
+            if last_ns is None:
+                continue
+            if last_ns >= cutoff_ns:
+                break
+            to_remove.append(name)
         
         for name in to_remove:
-            del self.tool_metrics[name]
+            self.tool_metrics.pop(name, None)
         
         if to_remove:
             log.info("metrics.cleanup removed=%d tools", len(to_remove))
         
-        self._last_cleanup = time.time()
+        self._last_cleanup = time.monotonic()
     
     def _evict_oldest_metrics(self):
         """Evict least recently used metrics."""
         if not self.tool_metrics:
             return
         
-        oldest_name = None
-        oldest_time = datetime.now()
-        
-        for name, metrics in self.tool_metrics.items():
-            last_time = metrics.metrics.last_execution_time
-            if last_time and last_time < oldest_time:
-                oldest_time = last_time
-                oldest_name = name
-        
-        if oldest_name:
-            del self.tool_metrics[oldest_name]
-            log.info("metrics.evicted tool=%s", oldest_name)
+        oldest_name, _ = self.tool_metrics.popitem(last=False)
+        log.info("metrics.evicted tool=%s", oldest_name)
     
-    def get_all_stats(self) -> Dict[str, Any]:
-        """Get all metrics statistics."""
+    def get_all_stats(self, percentiles: bool = True) -> Dict[str, Any]:
+        """
+        Get all metrics statistics.
+        
+        With ``percentiles=False`` only per-tool counters are collected, which
+        skips all recent-window work.
+        """
+        with self._lock:
+            tools = list(self.tool_metrics.items())
+        if percentiles:
+            # One lock acquisition per tool; all formatting happens outside the locks
+            snapshots = [metrics.metrics.snapshot(defer_window=True) for _, metrics in tools]
+            batched = _batch_window_percentiles([snapshot[2] for snapshot in snapshots])
+            tool_stats = {
+                name: metrics.metrics.format_snapshot(snapshots[position], batched.get(position))
+                for position, (name, metrics) in enumerate(tools)
+            }
+        else:
+            tool_stats = {name: metrics.get_counters() for name, metrics in tools}
         return {
             "system": self.system_metrics.get_stats(),
-            "tools": {name: metrics.get_stats() for name, metrics in self.tool_metrics.items()},
+            "tools": tool_stats,
             "prometheus_available": _prometheus_registry.available,
             "collection_start_time": self.start_time.isoformat()
         }
     
+    def get_prometheus_metrics_bytes(self) -> Optional[bytes]:
+        """Get Prometheus metrics as encoded exposition bytes, ready for an HTTP body."""
+        return _generate_prometheus_bytes()
+    
     def get_prometheus_metrics(self) -> Optional[str]:
         """Get Prometheus metrics in text format."""
-        if _prometheus_registry.available and _prometheus_registry.generate_latest:
-            try:
-                return _prometheus_registry.generate_latest(_prometheus_registry.registry).decode('utf-8')
-            except Exception as e:
-                log.error("prometheus.generate_metrics_error error=%s", str(e))
-                return None
-        return None
+        payload = self.get_prometheus_metrics_bytes()
+        return payload.decode('utf-8') if payload is not None else None
+
+
+_metrics_manager = MetricsManager()
 
 
 class PrometheusMetrics:
@@ -528,10 +919,5 @@ class PrometheusMetrics:
     
     def get_metrics(self) -> Optional[str]:
         """Get Prometheus metrics."""
-        if _prometheus_registry.available and _prometheus_registry.generate_latest:
-            try:
-                return _prometheus_registry.generate_latest(_prometheus_registry.registry).decode('utf-8')
-            except Exception as e:
-                log.error("prometheus.generate_metrics_error error=%s", str(e))
-                return None
-        return None
+        payload = _generate_prometheus_bytes()
+        return payload.decode('utf-8') if payload is not None else None
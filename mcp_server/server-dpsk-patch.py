@@ -278,7 +278,7 @@ class EnhancedMCPServer:
         
         self.tool_registry = ToolRegistry(self.config, tools)
         self.health_manager = HealthCheckManager(config=self.config)
-        self.metrics_manager = MetricsManager()
+        self.metrics_manager = MetricsManager.get()
         
         self.shutdown_event = asyncio.Event()
         self._background_tasks: Set[asyncio.Task] = set()
@@ -249,7 +249,7 @@ class EnhancedMCPServer:
         self.config = config or get_config()
         self.tool_registry = ToolRegistry(self.config, tools)
         self.health_manager = HealthCheckManager(config=self.config)
-        self.metrics_manager = MetricsManager()
+        self.metrics_manager = MetricsManager.get()
         self.shutdown_event = asyncio.Event()
         self._background_tasks: Set[asyncio.Task] = set()
 
@@ -480,7 +480,7 @@ class EnhancedMCPServer:
         async def metrics():
             """Prometheus metrics endpoint."""
             if PROMETHEUS_AVAILABLE:
-                metrics_text = self.metrics_manager.get_prometheus_metrics()
+                metrics_text = self.metrics_manager.get_prometheus_metrics_bytes()
                 if metrics_text:
                     return Response(content=metrics_text, media_type=CONTENT_TYPE_LATEST)
             return JSONResponse(content=self.metrics_manager.get_all_stats())
@@ -16,6 +16,8 @@ from mcp_server.config import get_config
 
 log = logging.getLogger(__name__)
 
+_EXTENSIONS_RE = re.compile(r'\A[a-zA-Z0-9,]+\Z')
+
 
 class GobusterTool(MCPBaseTool):
     """
@@ -444,7 +446,7 @@ class GobusterTool(MCPBaseTool):
                     
                     extensions = args[i + 1]
                     # Validate extensions format
-                    if not re.match(r'^[a-zA-Z0-9,]+$', extensions):
+                    if not _EXTENSIONS_RE.match(extensions):
                         raise ValueError(f"Invalid extensions format: {extensions}")
                     
                     # Limit to reasonable set if intrusive not allowed
@@ -23,6 +23,8 @@ from mcp_server.config import get_config
 
 log = logging.getLogger(__name__)
 
+_LOGIN_NAME_RE = re.compile(r'\A[a-zA-Z0-9_\-\.@]+\Z')
+
 class HydraTool(MCPBaseTool):
     """
     Enhanced online password cracking tool with comprehensive safety controls.
@@ -487,7 +489,7 @@ class HydraTool(MCPBaseTool):
                 return False
         else:
             # Single login name - basic validation
-            return len(spec) <= 64 and re.match(r'^[a-zA-Z0-9_\-\.@]+$', spec)
+            return len(spec) <= 64 and _LOGIN_NAME_RE.match(spec) is not None
     
     def _is_safe_password_spec(self, spec: str, is_file: bool) -> bool:
         """Validate password specification (ENHANCED FEATURE)."""
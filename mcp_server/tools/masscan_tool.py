@@ -15,6 +15,10 @@ from mcp_server.config import get_config
 
 log = logging.getLogger(__name__)
 
+# \A...\Z rather than ^...$ so a trailing newline cannot slip through
+_INTERFACE_RE = re.compile(r'\A[a-zA-Z0-9_\-.]+\Z')
+_PORT_CHARS_RE = re.compile(r'\A[0-9,\-]+\Z')
+
 
 class MasscanTool(MCPBaseTool):
     """
@@ -350,7 +354,7 @@ class MasscanTool(MCPBaseTool):
             if token in ("-e", "--interface"):
                 if i + 1 < len(tokens):
                     interface = tokens[i + 1]
-                    if not re.match(r'^[a-zA-Z0-9_\-.]+$', interface):
+                    if not _INTERFACE_RE.match(interface):
                         return self._create_error_output(
                             ErrorContext(
                                 error_type=ToolErrorType.VALIDATION_ERROR,
@@ -397,7 +401,7 @@ class MasscanTool(MCPBaseTool):
             port_spec = port_spec[2:]
         
         # Check for valid characters
-        if not re.match(r'^[\d,\-]+$', port_spec):
+        if not _PORT_CHARS_RE.match(port_spec):
             return False
         
         # Validate ranges
@@ -3,18 +3,103 @@ Enhanced Nmap tool with circuit breaker, metrics, and comprehensive security con
 Production-ready implementation with strict safety enforcement.
 """
 import logging
+import os
 import shlex
+import sys
+import tempfile
 import ipaddress
-import math
-from datetime import datetime, timezone
-from typing import Sequence, Optional, Dict, Any, Set
-import re
+from functools import lru_cache
+from typing import Sequence, Optional, Dict, Any, FrozenSet, List, Tuple
 
-from mcp_server.base_tool import MCPBaseTool, ToolInput, ToolOutput, ToolErrorType, ErrorContext
+from mcp_server.base_tool import (
+    MCPBaseTool,
+    ToolInput,
+    ToolOutput,
+    ToolErrorType,
+    ErrorContext,
+    _AuditEvent,
+    _log_audit,
+)
 from mcp_server.config import get_config
 
 log = logging.getLogger(__name__)
 
+def _flag_set(*flags: str) -> FrozenSet[str]:
+    """Frozenset of interned flags, so lookups of interned tokens hit on identity."""
+    return frozenset(map(sys.intern, flags))
+
+
+# What _optimize_nmap_args produces for an empty argument list
+_DEFAULT_OPTIMIZED_ARGS = "-T4 --max-parallelism 10 -Pn --top-ports 1000"
+
+# Flags whose value must be numeric; durations additionally accept ms/s/m suffixes
+_DURATION_VALUE_FLAGS = _flag_set("--host-timeout", "--scan-delay", "--max-scan-delay")
+_NUMERIC_VALUE_FLAGS = _flag_set(
+    "--max-parallelism", "--version-intensity", "--min-rate",
+    "--max-rate", "--max-retries", "--top-ports", "--mtu",
+    "--data-length", "--ttl", "--source-port", "-g"
+)
+_VALUE_FLAGS = _DURATION_VALUE_FLAGS | _NUMERIC_VALUE_FLAGS
+_PORT_SPEC_FLAGS = _flag_set("-p", "--ports")
+_FAST_TIMING_FLAGS = _flag_set("-T4", "-T5")
+
+# Tokens _optimize_nmap_args looks for before injecting its defaults
+_PARALLELISM_FLAGS = _flag_set("--max-parallelism", "--max-parallelism=10")
+_HOST_DISCOVERY_FLAGS = _flag_set("-Pn", "-sn", "-PS", "-PA")
+_PORT_FLAGS = _flag_set("-p", "--ports", "--top-ports")
+
+# Recovery suggestions shared by the validation error paths
+_SUGGEST_VALID_CIDR = "Use valid CIDR notation (e.g., 192.168.1.0/24)"
+_SUGGEST_PRIVATE_NETWORKS = "Use RFC1918 ranges (10.0.0.0/8, 172.16.0.0/12, 192.168.0.0/16)"
+_SUGGEST_PRIVATE_ONLY = "Use RFC1918 or loopback addresses"
+_SUGGEST_LAB_HOSTNAME = "Use hostnames ending with .lab.internal"
+_SUGGEST_CHECK_ARGS = "Check argument syntax and allowed flags"
+_SUGGEST_SPLIT_BATCH = "Split the target list into smaller batches"
+
+# Deletes every character allowed in a port spec; anything left over is invalid
+_PORT_SPEC_STRIP = str.maketrans("", "", "0123456789,-")
+
+
+def _split_targets(target: str) -> List[str]:
+    """Split a comma/whitespace separated target list, dropping duplicates in order."""
+    return list(dict.fromkeys(target.replace(",", " ").split()))
+
+
+def _is_private_v4(ip_int: int, prefixlen: int = 32) -> bool:
+    """True when an IPv4 address/prefix lies wholly inside RFC1918 or loopback space."""
+    return (
+        (prefixlen >= 8 and (ip_int & 0xFF000000) in (0x0A000000, 0x7F000000))
+        or (prefixlen >= 12 and (ip_int & 0xFFF00000) == 0xAC100000)
+        or (prefixlen >= 16 and (ip_int & 0xFFFF0000) == 0xC0A80000)
+    )
+
+
+@lru_cache(maxsize=1024)
+def _classify_target(target: str) -> Tuple[str, int, bool, str, str]:
+    """
+    Parse a stripped nmap target once per distinct string.
+    
+    Returns (kind, num_addresses, private_or_loopback, canonical, network_address)
+    where kind is "network", "ip", "host" (not an address) or "invalid" (bad CIDR).
+    """
+    if "/" in target:
+        try:
+            network = ipaddress.ip_network(target, strict=False)
+        except ValueError:
+            return "invalid", 0, False, target, ""
+        # Integer range test covers the common case; ipaddress handles the rest
+        private = (
+            (network.version == 4 and _is_private_v4(int(network.network_address), network.prefixlen))
+            or network.is_private or network.is_loopback
+        )
+        return "network", network.num_addresses, private, str(network), str(network.network_address)
+    try:
+        ip = ipaddress.ip_address(target)
+    except ValueError:
+        return "host", 0, False, target, ""
+    private = (ip.version == 4 and _is_private_v4(int(ip))) or ip.is_private or ip.is_loopback
+    return "ip", 1, private, str(ip), str(ip)
+
 
 class NmapTool(MCPBaseTool):
     """
@@ -41,7 +126,7 @@ class NmapTool(MCPBaseTool):
     
     # Conservative, safe flags for nmap
     # -A flag controlled by policy
-    BASE_ALLOWED_FLAGS: Sequence[str] = (
+    BASE_ALLOWED_FLAGS: Sequence[str] = tuple(map(sys.intern, (
         "-sV", "-sC", "-p", "--top-ports", "-T", "-T4", "-Pn",
         "-O", "--script", "-oX", "-oN", "-oG", "--max-parallelism",
         "-sS", "-sT", "-sU", "-sn", "-PS", "-PA", "-PU", "-PY",
@@ -56,7 +141,10 @@ class NmapTool(MCPBaseTool):
         "--ttl",  # TTL
         "--randomize-hosts",  # Host randomization
         "--spoof-mac",  # MAC spoofing (controlled)
-    )
+    )))
+    # Shared allowed-flag sets for each intrusive policy; instances just point at one
+    _ALLOWED_FLAGS_SAFE: FrozenSet[str] = frozenset(BASE_ALLOWED_FLAGS)
+    _ALLOWED_FLAGS_INTRUSIVE: FrozenSet[str] = _ALLOWED_FLAGS_SAFE | _flag_set("-A")
     
     # Nmap can run long; set higher timeout
     default_timeout_sec: float = 600.0
@@ -72,43 +160,51 @@ class NmapTool(MCPBaseTool):
     # Safety limits
     MAX_NETWORK_SIZE = 1024  # Maximum number of hosts in a network range
     MAX_PORT_RANGES = 100    # Maximum number of port ranges
+    MAX_BATCH_TARGETS = 64   # Maximum number of targets passed via -iL in one run
     
     # Safe script categories (always allowed)
-    SAFE_SCRIPT_CATEGORIES: Set[str] = {"safe", "default", "discovery", "version"}
+    SAFE_SCRIPT_CATEGORIES: FrozenSet[str] = frozenset({"safe", "default", "discovery", "version"})
     
     # Specific safe scripts (always allowed)
-    SAFE_SCRIPTS: Set[str] = {
+    SAFE_SCRIPTS: FrozenSet[str] = frozenset({
         "http-headers", "ssl-cert", "ssh-hostkey", "smb-os-discovery",
         "dns-brute", "http-title", "ftp-anon", "smtp-commands",
         "pop3-capabilities", "imap-capabilities", "mongodb-info",
         "mysql-info", "ms-sql-info", "oracle-sid-brute",
         "rdp-enum-encryption", "vnc-info", "x11-access"
-    }
+    })
     
     # Intrusive script categories (require policy)
-    INTRUSIVE_SCRIPT_CATEGORIES: Set[str] = {"vuln", "exploit", "intrusive", "brute", "dos"}
+    INTRUSIVE_SCRIPT_CATEGORIES: FrozenSet[str] = frozenset({"vuln", "exploit", "intrusive", "brute", "dos"})
     
     # Intrusive specific scripts (require policy)
-    INTRUSIVE_SCRIPTS: Set[str] = {
+    INTRUSIVE_SCRIPTS: FrozenSet[str] = frozenset({
         "http-vuln-*", "smb-vuln-*", "ssl-heartbleed", "ms-sql-brute",
         "mysql-brute", "ftp-brute", "ssh-brute", "rdp-brute",
         "dns-zone-transfer", "snmp-brute", "http-slowloris"
-    }
+    })
     
-    _EXTRA_ALLOWED_TOKENS = {"-T4", "--max-parallelism", "10", "-Pn", "--top-ports", "1000"}
-    _FLAGS_REQUIRE_VALUE = {
+    _EXTRA_ALLOWED_TOKENS = _flag_set("-T4", "--max-parallelism", "10", "-Pn", "--top-ports", "1000")
+    _FLAGS_REQUIRE_VALUE = _flag_set(
         "-p", "--ports", "--max-parallelism", "--version-intensity",
         "--min-rate", "--max-rate", "--max-retries", "--host-timeout",
         "--top-ports", "--scan-delay", "--max-scan-delay", "--mtu",
         "--data-length", "--ttl", "--source-port", "-g"
-    }
+    )
 
     def __init__(self):
         """Initialize Nmap tool with enhanced features."""
         super().__init__()
         self.config = get_config()
         self.allow_intrusive = False
-        self.allowed_flags = list(self.BASE_ALLOWED_FLAGS)
+        self.allowed_flags = self._ALLOWED_FLAGS_SAFE
+        # Wildcard script patterns ("http-vuln-*") reduced to prefixes for one startswith call
+        self._intrusive_wildcard_prefixes = tuple(
+            pattern.replace('*', '') for pattern in self.INTRUSIVE_SCRIPTS if '*' in pattern
+        )
+        # MAX_NETWORK_SIZE is fixed per class, so the suggested prefix and its advice are too
+        self._max_cidr = self._get_max_cidr_for_size(self.MAX_NETWORK_SIZE)
+        self._suggest_network_size = f"Use /{self._max_cidr} or smaller (max {self.MAX_NETWORK_SIZE} hosts)"
         self._apply_config()
     
     def _apply_config(self):
@@ -135,17 +231,9 @@ class NmapTool(MCPBaseTool):
                 sec = self.config.security
                 if hasattr(sec, 'allow_intrusive'):
                     self.allow_intrusive = bool(sec.allow_intrusive)
-                    
-                    # Update allowed flags based on policy
                     if self.allow_intrusive:
-                        # Add -A flag only if intrusive allowed
-                        if "-A" not in self.allowed_flags:
-                            self.allowed_flags.append("-A")
                         log.info("nmap.intrusive_enabled -A_flag_allowed")
                     else:
-                        # Remove -A flag if not allowed
-                        if "-A" in self.allowed_flags:
-                            self.allowed_flags.remove("-A")
                         log.info("nmap.intrusive_disabled -A_flag_blocked")
             
             log.debug("nmap.config_applied intrusive=%s", self.allow_intrusive)
@@ -158,9 +246,13 @@ class NmapTool(MCPBaseTool):
             self.default_timeout_sec = 600.0
             self.concurrency = 1
             self.allow_intrusive = False
-            # Ensure -A is not in allowed flags
-            if "-A" in self.allowed_flags:
-                self.allowed_flags.remove("-A")
+        
+        # -A is only present in the intrusive set
+        self.allowed_flags = self._ALLOWED_FLAGS_INTRUSIVE if self.allow_intrusive else self._ALLOWED_FLAGS_SAFE
+        # Per-instance memo of final argument strings; a fresh cache drops stale policy results
+        self._final_args_cache = lru_cache(maxsize=512)(self._build_final_args)
+        self._script_filter_cache = lru_cache(maxsize=256)(self._filter_scripts)
+        self._tool_info_static = self._build_static_tool_info()
     
     async def _execute_tool(self, inp: ToolInput, timeout_sec: Optional[float] = None) -> ToolOutput:
         """Execute Nmap with enhanced validation and optimization."""
@@ -169,127 +261,171 @@ class NmapTool(MCPBaseTool):
         if validation_result:
             return validation_result
         
-        # Parse and validate arguments
+        # Parse, validate and optimize arguments (memoized per extra_args/policy)
+        extra_args = inp.extra_args or ""
         try:
-            parsed_args = self._parse_and_validate_args(inp.extra_args or "")
+            if extra_args.strip():
+                optimized_args, audit = self._final_args_cache(extra_args, self.allow_intrusive)
+                _log_audit(log, audit)
+            else:
+                optimized_args = _DEFAULT_OPTIMIZED_ARGS
         except ValueError as e:
-            error_context = ErrorContext(
-                error_type=ToolErrorType.VALIDATION_ERROR,
-                message=f"Invalid arguments: {str(e)}",
-                recovery_suggestion="Check argument syntax and allowed flags",
-                timestamp=self._get_timestamp(),
-                tool_name=self.tool_name,
-                target=inp.target,
-                metadata={"error": str(e)}
+            return self._validation_error(
+                inp.target, inp.correlation_id, f"Invalid arguments: {str(e)}", _SUGGEST_CHECK_ARGS,
+                error=str(e)
             )
-            return self._create_error_output(error_context, inp.correlation_id or "")
         
-        # Optimize arguments
-        optimized_args = self._optimize_nmap_args(parsed_args)
+        hosts = _split_targets(inp.target)
         
         # Create enhanced input
         enhanced_input = ToolInput(
-            target=inp.target,
+            target=hosts[0] if len(hosts) == 1 else inp.target,
             extra_args=optimized_args,
             timeout_sec=timeout_sec or inp.timeout_sec or self.default_timeout_sec,
             correlation_id=inp.correlation_id,
         )
         
-        # Execute with base class method
-        return await super()._execute_tool(enhanced_input, enhanced_input.timeout_sec)
+        if len(hosts) == 1:
+            # Execute with base class method
+            return await super()._execute_tool(enhanced_input, enhanced_input.timeout_sec)
+        
+        # Several targets share one nmap process (and its startup cost) via an input list
+        with tempfile.NamedTemporaryFile(
+            mode="w", prefix="nmap-targets-", suffix=".txt", delete=False
+        ) as target_file:
+            target_file.write("\n".join(hosts))
+            target_file.write("\n")
+        try:
+            return await self._execute_command(
+                enhanced_input, ("-iL", target_file.name), enhanced_input.timeout_sec
+            )
+        finally:
+            try:
+                os.unlink(target_file.name)
+            except OSError as e:
+                log.warning("nmap.target_list_cleanup_failed path=%s error=%s", target_file.name, e)
+    
+    def _validation_error(self, target: str, corr_id: Optional[str], message: str,
+                          suggestion: str, **metadata: Any) -> ToolOutput:
+        """Build a validation ErrorContext and render it as a ToolOutput."""
+        error_context = ErrorContext(
+            error_type=ToolErrorType.VALIDATION_ERROR,
+            message=message,
+            recovery_suggestion=suggestion,
+            tool_name=self.tool_name,
+            target=target,
+            metadata=metadata
+        )
+        return self._create_error_output(error_context, corr_id or "")
     
     def _validate_nmap_requirements(self, inp: ToolInput) -> Optional[ToolOutput]:
         """Validate nmap-specific requirements with clear messaging."""
         target = inp.target.strip()
+        corr_id = inp.correlation_id
+        hosts = _split_targets(target)
+        if len(hosts) <= 1:
+            return self._validate_target(hosts[0] if hosts else target, corr_id)
+        
+        # Target list: every entry must pass the single-target rules
+        if len(hosts) > self.MAX_BATCH_TARGETS:
+            return self._validation_error(
+                target, corr_id,
+                f"Too many targets: {len(hosts)} (max: {self.MAX_BATCH_TARGETS})",
+                _SUGGEST_SPLIT_BATCH,
+                target_count=len(hosts),
+                max_allowed=self.MAX_BATCH_TARGETS
+            )
+        networks: Dict[int, List[Any]] = {4: [], 6: []}
+        hostnames = 0
+        for host in hosts:
+            error = self._validate_target(host, corr_id)
+            if error:
+                return error
+            kind, _, _, canonical, _ = _classify_target(host)
+            if kind == "host":
+                hostnames += 1
+            else:
+                network = ipaddress.ip_network(canonical, strict=False)
+                networks[network.version].append(network)
+        
+        # The whole list shares one nmap run, so the size limit applies to its union
+        total_addresses = hostnames + sum(
+            network.num_addresses
+            for nets in networks.values()
+            for network in ipaddress.collapse_addresses(nets)
+        )
+        if total_addresses > self.MAX_NETWORK_SIZE:
+            return self._validation_error(
+                target, corr_id,
+                f"Target list too large: {total_addresses} addresses (max: {self.MAX_NETWORK_SIZE})",
+                _SUGGEST_SPLIT_BATCH,
+                network_size=total_addresses,
+                max_allowed=self.MAX_NETWORK_SIZE
+            )
+        return None
+    
+    def _validate_target(self, target: str, corr_id: Optional[str]) -> Optional[ToolOutput]:
+        """Validate a single stripped target (IP, CIDR range or hostname)."""
+        kind, num_addresses, private_or_loopback, canonical, network_address = _classify_target(target)
         
         # Validate network ranges
-        if "/" in target:
-            try:
-                network = ipaddress.ip_network(target, strict=False)
-            except ValueError:
-                error_context = ErrorContext(
-                    error_type=ToolErrorType.VALIDATION_ERROR,
-                    message=f"Invalid network range: {target}",
-                    recovery_suggestion="Use valid CIDR notation (e.g., 192.168.1.0/24)",
-                    timestamp=self._get_timestamp(),
-                    tool_name=self.tool_name,
-                    target=target,
-                    metadata={"input": target}
-                )
-                return self._create_error_output(error_context, inp.correlation_id or "")
-            
+        if kind == "invalid":
+            return self._validation_error(
+                target, corr_id, f"Invalid network range: {target}", _SUGGEST_VALID_CIDR,
+                input=target
+            )
+        
+        if kind == "network":
             # Check network size with clear messaging
-            if network.num_addresses > self.MAX_NETWORK_SIZE:
-                max_cidr = self._get_max_cidr_for_size(self.MAX_NETWORK_SIZE)
-                error_context = ErrorContext(
-                    error_type=ToolErrorType.VALIDATION_ERROR,
-                    message=f"Network range too large: {network.num_addresses} addresses (max: {self.MAX_NETWORK_SIZE})",
-                    recovery_suggestion=f"Use /{max_cidr} or smaller (max {self.MAX_NETWORK_SIZE} hosts)",
-                    timestamp=self._get_timestamp(),
-                    tool_name=self.tool_name,
-                    target=target,
-                    metadata={
-                        "network_size": network.num_addresses,
-                        "max_allowed": self.MAX_NETWORK_SIZE,
-                        "suggested_cidr": f"/{max_cidr}",
-                        "example": f"{network.network_address}/{max_cidr}"
-                    }
+            if num_addresses > self.MAX_NETWORK_SIZE:
+                max_cidr = self._max_cidr
+                return self._validation_error(
+                    target, corr_id,
+                    f"Network range too large: {num_addresses} addresses (max: {self.MAX_NETWORK_SIZE})",
+                    self._suggest_network_size,
+                    network_size=num_addresses,
+                    max_allowed=self.MAX_NETWORK_SIZE,
+                    suggested_cidr=f"/{max_cidr}",
+                    example=f"{network_address}/{max_cidr}"
                 )
-                return self._create_error_output(error_context, inp.correlation_id or "")
             
             # Ensure private network
-            if not (network.is_private or network.is_loopback):
-                error_context = ErrorContext(
-                    error_type=ToolErrorType.VALIDATION_ERROR,
-                    message=f"Only private networks allowed: {target}",
-                    recovery_suggestion="Use RFC1918 ranges (10.0.0.0/8, 172.16.0.0/12, 192.168.0.0/16)",
-                    timestamp=self._get_timestamp(),
-                    tool_name=self.tool_name,
-                    target=target,
-                    metadata={"network": str(network)}
+            if not private_or_loopback:
+                return self._validation_error(
+                    target, corr_id, f"Only private networks allowed: {target}", _SUGGEST_PRIVATE_NETWORKS,
+                    network=canonical
                 )
-                return self._create_error_output(error_context, inp.correlation_id or "")
-        else:
+        elif kind == "ip":
             # Single host validation
-            try:
-                ip = ipaddress.ip_address(target)
-                if not (ip.is_private or ip.is_loopback):
-                    error_context = ErrorContext(
-                        error_type=ToolErrorType.VALIDATION_ERROR,
-                        message=f"Only private IPs allowed: {target}",
-                        recovery_suggestion="Use RFC1918 or loopback addresses",
-                        timestamp=self._get_timestamp(),
-                        tool_name=self.tool_name,
-                        target=target,
-                        metadata={"ip": str(ip)}
-                    )
-                    return self._create_error_output(error_context, inp.correlation_id or "")
-            except ValueError:
-                # Must be a hostname
-                if not target.endswith(".lab.internal"):
-                    error_context = ErrorContext(
-                        error_type=ToolErrorType.VALIDATION_ERROR,
-                        message=f"Only .lab.internal hostnames allowed: {target}",
-                        recovery_suggestion="Use hostnames ending with .lab.internal",
-                        timestamp=self._get_timestamp(),
-                        tool_name=self.tool_name,
-                        target=target,
-                        metadata={"hostname": target}
-                    )
-                    return self._create_error_output(error_context, inp.correlation_id or "")
+            if not private_or_loopback:
+                return self._validation_error(
+                    target, corr_id, f"Only private IPs allowed: {target}", _SUGGEST_PRIVATE_ONLY,
+                    ip=canonical
+                )
+        elif not target.endswith(".lab.internal"):
+            # Must be a hostname
+            return self._validation_error(
+                target, corr_id, f"Only .lab.internal hostnames allowed: {target}", _SUGGEST_LAB_HOSTNAME,
+                hostname=target
+            )
         
         return None
     
     def _get_max_cidr_for_size(self, max_hosts: int) -> int:
         """Calculate maximum CIDR prefix for given host count."""
         # For max_hosts=1024, we need /22 (which gives 1024 addresses)
-        bits_needed = math.ceil(math.log2(max_hosts))
+        bits_needed = (max_hosts - 1).bit_length() if max_hosts > 1 else 0
         return max(0, 32 - bits_needed)
     
-    def _parse_and_validate_args(self, extra_args: str) -> str:
-        """Parse and validate nmap arguments with strict security."""
+    def _parse_and_validate_args(self, extra_args: str, audit: Optional[List[_AuditEvent]] = None) -> List[str]:
+        """
+        Parse and validate nmap arguments with strict security, returning tokens.
+        
+        Policy decisions worth logging are appended to audit when given,
+        otherwise they are logged immediately.
+        """
         if not extra_args:
-            return ""
+            return []
         
         try:
             tokens = shlex.split(extra_args)
@@ -304,6 +440,8 @@ class NmapTool(MCPBaseTool):
             # Block non-flag tokens completely for security
             if not token.startswith("-"):
                 raise ValueError(f"Unexpected non-flag token (potential injection): {token}")
+            # Flags are matched against the interned class vocabularies below
+            token = sys.intern(token)
             
             # Check -A flag (controlled by policy)
             if token == "-A":
@@ -313,7 +451,7 @@ class NmapTool(MCPBaseTool):
                 i += 1
             
             # Check port specifications
-            elif token in ("-p", "--ports"):
+            elif token in _PORT_SPEC_FLAGS:
                 if i + 1 < len(tokens):
                     port_spec = tokens[i + 1]
                     if not self._validate_port_specification(port_spec):
@@ -327,7 +465,7 @@ class NmapTool(MCPBaseTool):
             elif token == "--script":
                 if i + 1 < len(tokens):
                     script_spec = tokens[i + 1]
-                    validated_scripts = self._validate_and_filter_scripts(script_spec)
+                    validated_scripts = self._validate_and_filter_scripts(script_spec, audit)
                     if not validated_scripts:
                         raise ValueError(f"No allowed scripts in specification: {script_spec}")
                     validated.extend([token, validated_scripts])
@@ -345,16 +483,13 @@ class NmapTool(MCPBaseTool):
             
             # Check other flags
             else:
-                flag_base, flag_value = (token.split("=", 1) + [None])[:2]
+                flag_base, sep, flag_value = token.partition("=")
+                if sep:
+                    flag_base = sys.intern(flag_base)
                 if flag_base in self.allowed_flags:
-                    expects_value = flag_base in {
-                        "--max-parallelism", "--version-intensity", "--min-rate",
-                        "--max-rate", "--max-retries", "--host-timeout", "--top-ports",
-                        "--scan-delay", "--max-scan-delay", "--mtu", "--data-length",
-                        "--ttl", "--source-port", "-g"
-                    }
+                    expects_value = flag_base in _VALUE_FLAGS
 
-                    if flag_value is not None:
+                    if sep:
                         if not expects_value:
                             raise ValueError(f"Flag does not take inline value: {token}")
                         if not self._validate_numeric_value(flag_base, flag_value):
@@ -377,7 +512,23 @@ class NmapTool(MCPBaseTool):
                 else:
                     raise ValueError(f"Flag not allowed: {token}")
         
-        return " ".join(validated)
+        return validated
+    
+    def _build_final_args(self, extra_args: str, allow_intrusive: bool) -> Tuple[str, Tuple[_AuditEvent, ...]]:
+        """
+        Validate and optimize extra_args into the final argument string.
+        
+        Returns the string plus the audit events the caller must log per
+        request. allow_intrusive is part of the cache key only; validation
+        reads the current policy from the instance.
+        """
+        audit: List[_AuditEvent] = []
+        try:
+            tokens = self._optimize_nmap_args(self._parse_and_validate_args(extra_args, audit), audit)
+        except ValueError:
+            _log_audit(log, audit)
+            raise
+        return " ".join(tokens), tuple(audit)
     
     def _validate_port_specification(self, port_spec: str) -> bool:
         """Validate port specification for safety."""
@@ -385,8 +536,8 @@ class NmapTool(MCPBaseTool):
         if not port_spec:
             return False
         
-        # Check for valid characters
-        if not re.match(r'^[\d,\-]+$', port_spec):
+        # Check for valid characters (ASCII digits, commas and dashes only)
+        if port_spec.translate(_PORT_SPEC_STRIP):
             return False
         
         # Count ranges to prevent excessive specifications
@@ -416,9 +567,23 @@ class NmapTool(MCPBaseTool):
         
         return True
     
-    def _validate_and_filter_scripts(self, script_spec: str) -> str:
+    def _validate_and_filter_scripts(self, script_spec: str, audit: Optional[List[_AuditEvent]] = None) -> str:
         """Validate and filter script specification based on policy."""
+        allowed, events = self._script_filter_cache(script_spec, self.allow_intrusive)
+        if audit is None:
+            _log_audit(log, events)
+        else:
+            audit.extend(events)
+        return allowed
+    
+    def _filter_scripts(self, script_spec: str, allow_intrusive: bool) -> Tuple[str, Tuple[_AuditEvent, ...]]:
+        """
+        Filter a script specification under the given intrusive policy (memoized).
+        
+        Returns the allowed scripts and the allow/block decisions to log.
+        """
         allowed_scripts = []
+        events: List[_AuditEvent] = []
         scripts = script_spec.split(',')
         
         for script in scripts:
@@ -428,106 +593,114 @@ class NmapTool(MCPBaseTool):
             if script in self.SAFE_SCRIPT_CATEGORIES:
                 allowed_scripts.append(script)
             elif script in self.INTRUSIVE_SCRIPT_CATEGORIES:
-                if self.allow_intrusive:
+                if allow_intrusive:
                     allowed_scripts.append(script)
-                    log.info("nmap.intrusive_script_allowed script=%s", script)
+                    events.append((logging.INFO, "nmap.intrusive_script_allowed script=%s", (script,)))
                 else:
-                    log.warning("nmap.intrusive_script_blocked script=%s", script)
+                    events.append((logging.WARNING, "nmap.intrusive_script_blocked script=%s", (script,)))
             
             # Check if it's a specific script (exact match)
             elif script in self.SAFE_SCRIPTS:
                 allowed_scripts.append(script)
             elif script in self.INTRUSIVE_SCRIPTS:
-                if self.allow_intrusive:
+                if allow_intrusive:
                     allowed_scripts.append(script)
-                    log.info("nmap.intrusive_script_allowed script=%s", script)
+                    events.append((logging.INFO, "nmap.intrusive_script_allowed script=%s", (script,)))
                 else:
-                    log.warning("nmap.intrusive_script_blocked script=%s", script)
+                    events.append((logging.WARNING, "nmap.intrusive_script_blocked script=%s", (script,)))
             
             # Check wildcard patterns for intrusive scripts
-            elif any(script.startswith(pattern.replace('*', '')) for pattern in self.INTRUSIVE_SCRIPTS if '*' in pattern):
-                if self.allow_intrusive:
+            elif script.startswith(self._intrusive_wildcard_prefixes):
+                if allow_intrusive:
                     allowed_scripts.append(script)
-                    log.info("nmap.intrusive_script_allowed script=%s", script)
+                    events.append((logging.INFO, "nmap.intrusive_script_allowed script=%s", (script,)))
                 else:
-                    log.warning("nmap.intrusive_script_blocked script=%s", script)
+                    events.append((logging.WARNING, "nmap.intrusive_script_blocked script=%s", (script,)))
             
             else:
                 # Unknown script - block it
-                log.warning("nmap.unknown_script_blocked script=%s", script)
+                events.append((logging.WARNING, "nmap.unknown_script_blocked script=%s", (script,)))
         
-        return ','.join(allowed_scripts) if allowed_scripts else ""
+        return (','.join(allowed_scripts) if allowed_scripts else ""), tuple(events)
     
     def _validate_numeric_value(self, flag: str, value: str) -> bool:
         """Validate numeric-like values for flags that expect numbers or durations."""
-        if flag in {"--host-timeout", "--scan-delay", "--max-scan-delay"}:
-            return bool(re.match(r'^[0-9]+(ms|s|m)?$', value))
-        if flag in {"--max-parallelism", "--version-intensity", "--min-rate",
-                    "--max-rate", "--max-retries", "--top-ports", "--mtu",
-                    "--data-length", "--ttl", "--source-port", "-g"}:
-            return value.isdigit()
-        return False
+        if flag in _DURATION_VALUE_FLAGS:
+            # <digits> with an optional ms/s/m unit suffix
+            if value.endswith("ms"):
+                value = value[:-2]
+            elif value.endswith(("s", "m")):
+                value = value[:-1]
+        elif flag not in _NUMERIC_VALUE_FLAGS:
+            return False
+        # isdigit() alone also accepts non-ASCII digits such as fullwidth ones
+        return value.isascii() and value.isdigit()
 
-    def _optimize_nmap_args(self, extra_args: str) -> str:
-        """Optimize nmap arguments for performance and safety."""
-        if not extra_args:
-            extra_args = ""
+    def _optimize_nmap_args(self, tokens: List[str], audit: Optional[List[_AuditEvent]] = None) -> List[str]:
+        """Optimize validated nmap argument tokens for performance and safety."""
+        has_timing = has_parallelism = has_host_discovery = has_port_spec = has_aggressive = False
+        for t in tokens:
+            if t.startswith("-T"):
+                has_timing = True
+            elif t in _PARALLELISM_FLAGS:
+                has_parallelism = True
+            elif t in _HOST_DISCOVERY_FLAGS:
+                has_host_discovery = True
+            elif t in _PORT_FLAGS:
+                has_port_spec = True
+            elif t == "-A":
+                has_aggressive = True
 
-        try:
-            tokens = shlex.split(extra_args) if extra_args else []
-        except ValueError:
-            tokens = extra_args.split() if extra_args else []
+        # Nothing to inject: hand back the caller's tokens untouched
+        if (has_timing and has_parallelism and has_host_discovery and has_port_spec
+                and not has_aggressive):
+            return tokens
 
-        optimized = []
+        if has_aggressive:
+            # -A implies -O -sV -sC --traceroute; keep the rest of the scan modest
+            event = (logging.WARNING, "nmap.aggressive_scan timing_capped=T3 default_ports_skipped", ())
+            if audit is None:
+                _log_audit(log, (event,))
+            else:
+                audit.append(event)
+            tokens = ["-T3" if t in _FAST_TIMING_FLAGS else t for t in tokens]
 
-        has_timing = any(t.startswith("-T") for t in tokens)
-        has_parallelism = any(t in {"--max-parallelism", "--max-parallelism=10"} for t in tokens)
-        has_host_discovery = any(t in ("-Pn", "-sn", "-PS", "-PA") for t in tokens)
-        has_port_spec = any(t in ("-p", "--ports", "--top-ports") for t in tokens)
+        optimized = []
 
         if not has_timing:
-            optimized.append("-T4")
+            optimized.append("-T3" if has_aggressive else "-T4")
 
         if not has_parallelism:
-            optimized.extend(["--max-parallelism", "10"])
+            optimized.extend(["--max-parallelism", "5" if has_aggressive else "10"])
 
         if not has_host_discovery:
             optimized.append("-Pn")
 
-        if not has_port_spec:
+        if not has_port_spec and not has_aggressive:
             optimized.extend(["--top-ports", "1000"])
 
         optimized.extend(tokens)
 
-        return " ".join(optimized)
+        return optimized
     
-    def _get_timestamp(self) -> datetime:
-        """Get current timestamp with timezone."""
-        return datetime.now(timezone.utc)
-    
-    def get_tool_info(self) -> Dict[str, Any]:
-        """Get comprehensive tool information."""
+    def _build_static_tool_info(self) -> Dict[str, Any]:
+        """Tool information that only changes when configuration is applied."""
         return {
             "name": self.tool_name,
             "command": self.command_name,
             "description": self.__doc__ or "Nmap network scanner",
             "concurrency": self.concurrency,
             "timeout": self.default_timeout_sec,
-            "allowed_flags": list(self.allowed_flags),
+            "allowed_flags": tuple(sorted(self.allowed_flags)),
             "intrusive_allowed": self.allow_intrusive,
-            "circuit_breaker": {
-                "enabled": self._circuit_breaker is not None,
-                "failure_threshold": self.circuit_breaker_failure_threshold,
-                "recovery_timeout": self.circuit_breaker_recovery_timeout,
-                "state": self._circuit_breaker.state.name if self._circuit_breaker else "N/A"
-            },
             "safety_limits": {
                 "max_network_size": self.MAX_NETWORK_SIZE,
                 "max_port_ranges": self.MAX_PORT_RANGES,
-                "safe_script_categories": list(self.SAFE_SCRIPT_CATEGORIES),
-                "safe_scripts": list(self.SAFE_SCRIPTS),
-                "intrusive_categories": list(self.INTRUSIVE_SCRIPT_CATEGORIES) if self.allow_intrusive else [],
-                "intrusive_scripts": list(self.INTRUSIVE_SCRIPTS) if self.allow_intrusive else [],
+                "max_batch_targets": self.MAX_BATCH_TARGETS,
+                "safe_script_categories": tuple(self.SAFE_SCRIPT_CATEGORIES),
+                "safe_scripts": tuple(self.SAFE_SCRIPTS),
+                "intrusive_categories": tuple(self.INTRUSIVE_SCRIPT_CATEGORIES) if self.allow_intrusive else (),
+                "intrusive_scripts": tuple(self.INTRUSIVE_SCRIPTS) if self.allow_intrusive else (),
                 "-A_flag": "allowed" if self.allow_intrusive else "blocked"
             },
             "optimizations": {
@@ -541,6 +714,23 @@ class NmapTool(MCPBaseTool):
                 "script_filtering": "enforced",
                 "private_targets_only": True
             },
+        }
+    
+    def get_tool_info(self) -> Dict[str, Any]:
+        """Get comprehensive tool information."""
+        static = self._tool_info_static
+        # Nested dicts are copied so callers can mutate the result; the tuples inside are immutable
+        return {
+            **static,
+            "safety_limits": dict(static["safety_limits"]),
+            "optimizations": dict(static["optimizations"]),
+            "security": dict(static["security"]),
+            "circuit_breaker": {
+                "enabled": self._circuit_breaker is not None,
+                "failure_threshold": self.circuit_breaker_failure_threshold,
+                "recovery_timeout": self.circuit_breaker_recovery_timeout,
+                "state": self._circuit_breaker.state.name if self._circuit_breaker else "N/A"
+            },
             "metrics": {
                 "available": self.metrics is not None,
                 "prometheus": f'mcp_tool_execution_total{{tool="{self.tool_name}"}}' if self.metrics else None
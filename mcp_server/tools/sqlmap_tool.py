@@ -2,11 +2,16 @@
 """
 Enhanced Sqlmap tool with ALL framework features + comprehensive SQL injection safety.
 """
+import ipaddress
 import logging
 import re
 import shlex
-from typing import Sequence, Optional, List, Dict, Any, Union
-from urllib.parse import urlparse
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
+from typing import Sequence, Optional, List, Dict, Any, Tuple, Union
+from urllib.parse import urlparse, ParseResult
 
 # ORIGINAL IMPORT - PRESERVED EXACTLY
 from mcp_server.base_tool import (
@@ -16,6 +21,8 @@ from mcp_server.base_tool import (
     ToolErrorType,
     ErrorContext,
     _TOKEN_ALLOWED,
+    _AuditEvent,
+    _log_audit,
 )
 
 # ENHANCED IMPORT (ADDITIONAL)
@@ -23,6 +30,63 @@ from mcp_server.config import get_config
 
 log = logging.getLogger(__name__)
 
+# Structural limits applied before any URL/host parsing
+_MAX_URL_LENGTH = 2048
+_MAX_URL_DOTS = 16
+_MAX_HOSTNAME_LENGTH = 253
+_MAX_HOSTNAME_DOTS = 8
+_URL_SCHEME_PREFIXES = ("http://", "https://")
+
+# Dotted-quad IPv4 without leading zeros (which some clients read as octal)
+_IPV4_RE = re.compile(r'\A(0|[1-9]\d{0,2})\.(0|[1-9]\d{0,2})\.(0|[1-9]\d{0,2})\.(0|[1-9]\d{0,2})\Z')
+
+
+def _split_args(extra_args: str) -> List[str]:
+    """Tokenize arguments, paying for shlex only when quoting or escapes are present."""
+    if '"' in extra_args or "'" in extra_args or "\\" in extra_args:
+        return shlex.split(extra_args)
+    return extra_args.split()
+
+
+@lru_cache(maxsize=256)
+def _parse_url_cached(url: str) -> Optional[ParseResult]:
+    """Parse a URL once; the same target is validated several times per request.
+
+    Returns None for URLs urlparse rejects (e.g. unbalanced IPv6 brackets), so the
+    failure is cached too and callers need no exception handling.
+    """
+    try:
+        return urlparse(url)
+    except ValueError:
+        return None
+
+
+@dataclass(slots=True)
+class _SqlmapArgState:
+    """Security-relevant state collected while securing sqlmap arguments."""
+    has_url: bool = False
+    has_batch: bool = False
+    has_risk: bool = False
+    has_level: bool = False
+    audit: List[_AuditEvent] = field(default_factory=list)
+
+
+_USAGE_EXAMPLES = (
+    {
+        "description": "Basic SQL injection test",
+        "command": "sqlmap -u 'http://192.168.1.10/page.php?id=1' --batch --risk=1 --level=1"
+    },
+    {
+        "description": "Database enumeration",
+        "command": "sqlmap -u 'http://192.168.1.10/page.php?id=1' --batch --risk=1 --level=2 --dbs"
+    },
+    {
+        "description": "Table enumeration",
+        "command": "sqlmap -u 'http://192.168.1.10/page.php?id=1' --batch --risk=1 --level=2 -D testdb --tables"
+    },
+)
+
+
 class SqlmapTool(MCPBaseTool):
     """
     Enhanced SQL injection detection and exploitation tool with comprehensive safety controls.
@@ -100,6 +164,7 @@ class SqlmapTool(MCPBaseTool):
         "--json",                       # JSON output format
         "--xml",                        # XML output format
     ]
+    _allowed_flags_set: frozenset = frozenset(sys.intern(flag) for flag in allowed_flags)
     
     _EXTRA_ALLOWED_TOKENS = set()
     _FLAGS_REQUIRE_VALUE = {
@@ -132,6 +197,7 @@ class SqlmapTool(MCPBaseTool):
     # SQLMAP-SPECIFIC SECURITY LIMITS
     max_risk_level: int = 2  # Limit risk level to 1-2 (avoid aggressive testing)
     max_test_level: int = 3  # Limit test level to 1-3 (avoid excessive testing)
+    max_threads: int = 5  # Worker threads enforced on every run
     
     def __init__(self):
         # ORIGINAL: Call parent constructor (implicit)
@@ -157,6 +223,9 @@ class SqlmapTool(MCPBaseTool):
         self._circuit_breaker = None
         self._initialize_circuit_breaker()
 
+        # Per-instance memo of secured argument lists; rebuilt whenever features are set up
+        self._secured_args_cache = lru_cache(maxsize=512)(self._build_secured_args)
+
     
     async def _execute_tool(self, inp: ToolInput, timeout_sec: Optional[float] = None) -> ToolOutput:
         """
@@ -201,211 +270,226 @@ class SqlmapTool(MCPBaseTool):
         """Validate sqlmap-specific security requirements (ENHANCED FEATURE)."""
         # Validate that target is a proper URL
         if not self._is_valid_url(inp.target):
-            error_context = ErrorContext(
-                error_type=ToolErrorType.VALIDATION_ERROR,
-                message=f"Invalid SQLmap target URL: {inp.target}",
-                recovery_suggestion="Use valid URL format (e.g., http://192.168.1.10/page.php?id=1)",
-                timestamp=self._get_timestamp(),
-                tool_name=self.tool_name,
-                target=inp.target
-            )
-            return self._create_error_output(error_context, inp.correlation_id)
+            message = f"Invalid SQLmap target URL: {inp.target}"
+            suggestion = "Use valid URL format (e.g., http://192.168.1.10/page.php?id=1)"
         
         # Validate URL contains RFC1918 or .lab.internal
-        if not self._is_authorized_target(inp.target):
-            error_context = ErrorContext(
-                error_type=ToolErrorType.VALIDATION_ERROR,
-                message=f"Unauthorized SQLmap target: {inp.target}",
-                recovery_suggestion="Target must be RFC1918 IPv4 or .lab.internal hostname",
-                timestamp=self._get_timestamp(),
-                tool_name=self.tool_name,
-                target=inp.target
-            )
-            return self._create_error_output(error_context, inp.correlation_id)
+        elif not self._is_authorized_target(inp.target):
+            message = f"Unauthorized SQLmap target: {inp.target}"
+            suggestion = "Target must be RFC1918 IPv4 or .lab.internal hostname"
         
         # Validate that extra_args contains required URL flag
-        if not inp.extra_args.strip():
-            error_context = ErrorContext(
-                error_type=ToolErrorType.VALIDATION_ERROR,
-                message="SQLmap requires target URL specification with -u or --url",
-                recovery_suggestion="Specify target URL with -u flag (e.g., '-u http://192.168.1.10/page.php?id=1')",
-                timestamp=self._get_timestamp(),
-                tool_name=self.tool_name,
-                target=inp.target
-            )
-            return self._create_error_output(error_context, inp.correlation_id)
+        elif not inp.extra_args.strip():
+            message = "SQLmap requires target URL specification with -u or --url"
+            suggestion = "Specify target URL with -u flag (e.g., '-u http://192.168.1.10/page.php?id=1')"
         
-        return None
+        else:
+            return None
+        
+        # Only the branch that fired pays for the timestamp and context
+        error_context = ErrorContext(
+            error_type=ToolErrorType.VALIDATION_ERROR,
+            message=message,
+            recovery_suggestion=suggestion,
+            timestamp=self._get_timestamp(),
+            tool_name=self.tool_name,
+            target=inp.target
+        )
+        return self._create_error_output(error_context, inp.correlation_id)
     
     def _is_valid_url(self, url: str) -> bool:
         """Validate URL format (ENHANCED FEATURE)."""
-        try:
-            parsed = urlparse(url)
-            return all([parsed.scheme in ('http', 'https'), parsed.netloc])
-        except Exception:
+        if not url or len(url) > _MAX_URL_LENGTH or url.count('.') > _MAX_URL_DOTS:
+            return False
+        # Scheme whitelist before parsing: rejects javascript:, file:, data: and friends cheaply
+        if not url[:8].lower().startswith(_URL_SCHEME_PREFIXES):
             return False
+        parsed = _parse_url_cached(url)
+        return parsed is not None and parsed.scheme in ('http', 'https') and bool(parsed.netloc)
     
     def _is_authorized_target(self, url: str) -> bool:
         """Check if URL target is authorized (RFC1918 or .lab.internal) (ENHANCED FEATURE)."""
-        try:
-            parsed = urlparse(url)
-            hostname = parsed.hostname
-            
-            # Check .lab.internal
-            if hostname and hostname.endswith('.lab.internal'):
-                return True
-            
-            # Check RFC1918
-            if hostname:
-                import ipaddress
-                try:
-                    ip = ipaddress.ip_address(hostname)
-                    return ip.version == 4 and ip.is_private
-                except ValueError:
-                    # Not an IP address, check if hostname resolves to RFC1918
-                    pass
-            
-            # Extract IP from URL if present (e.g., http://192.168.1.10/page.php?id=1)
-            import re
-            ip_pattern = r'\b(192\.168\.\d{1,3}\.\d{1,3}|10\.\d{1,3}\.\d{1,3}\.\d{1,3}|172\.(1[6-9]|2[0-9]|3[01])\.\d{1,3}\.\d{1,3})\b'
-            ip_matches = re.findall(ip_pattern, url)
-            if ip_matches:
-                import ipaddress
-                ip = ipaddress.ip_address(ip_matches[0])
-                return ip.version == 4 and ip.is_private
-            
+        parsed = _parse_url_cached(url)
+        hostname = parsed.hostname if parsed is not None else None
+        if not hostname:
             return False
-            
-        except Exception:
+        if len(hostname) > _MAX_HOSTNAME_LENGTH or hostname.count('.') > _MAX_HOSTNAME_DOTS:
+            return False
+        
+        # Check .lab.internal
+        if hostname.endswith('.lab.internal'):
+            return True
+        
+        # Check RFC1918, fast path for plain dotted-quad IPv4
+        match = _IPV4_RE.match(hostname)
+        if match:
+            a, b, c, d = (int(octet) for octet in match.groups())
+            if max(a, b, c, d) > 255:
+                return False
+            return a == 10 or (a == 172 and 16 <= b <= 31) or (a == 192 and b == 168)
+        try:
+            ip = ipaddress.ip_address(hostname)
+            return ip.version == 4 and ip.is_private
+        except ValueError:
+            # Not an IP address and not .lab.internal
             return False
     
-    def _secure_sqlmap_args(self, extra_args: str) -> str:
+    def _handle_url(self, args: List[str], i: int, secured: List[str], state: "_SqlmapArgState") -> int:
+        """Keep -u/--url only when it points at an authorized target."""
+        if i + 1 < len(args):
+            url = args[i + 1]
+            if self._is_valid_url(url) and self._is_authorized_target(url):
+                secured.append(args[i])
+                secured.append(url)
+                state.has_url = True
+            else:
+                state.audit.append((logging.WARNING, "sqlmap.unauthorized_url url=%s", (url,)))
+        return i + 2
+
+    def _handle_batch(self, args: List[str], i: int, secured: List[str], state: "_SqlmapArgState") -> int:
+        """Record batch mode (required for safety)."""
+        secured.append(args[i])
+        state.has_batch = True
+        return i + 1
+
+    def _handle_risk(self, args: List[str], i: int, secured: List[str], state: "_SqlmapArgState") -> int:
+        """Clamp --risk to the configured maximum."""
+        if i + 1 < len(args):
+            try:
+                risk = int(args[i + 1])
+                if not 1 <= risk <= self.max_risk_level:
+                    state.audit.append((
+                        logging.WARNING, "sqlmap.risk_level_restricted risk=%d max=%d",
+                        (risk, self.max_risk_level),
+                    ))
+                    # Use maximum allowed risk level
+                    risk = self.max_risk_level
+            except ValueError:
+                # Invalid risk level, use default
+                risk = 1
+            secured.append(args[i])
+            secured.append(str(risk))
+            state.has_risk = True
+        return i + 2
+
+    def _handle_level(self, args: List[str], i: int, secured: List[str], state: "_SqlmapArgState") -> int:
+        """Clamp --level to the configured maximum."""
+        if i + 1 < len(args):
+            try:
+                level = int(args[i + 1])
+                if not 1 <= level <= self.max_test_level:
+                    state.audit.append((
+                        logging.WARNING, "sqlmap.test_level_restricted level=%d max=%d",
+                        (level, self.max_test_level),
+                    ))
+                    # Use maximum allowed test level
+                    level = self.max_test_level
+            except ValueError:
+                # Invalid test level, use default
+                level = 1
+            secured.append(args[i])
+            secured.append(str(level))
+            state.has_level = True
+        return i + 2
+
+    # Flags with dedicated security handling; everything else goes through the allow-list
+    _ARG_HANDLERS = {
+        "-u": _handle_url,
+        "--url": _handle_url,
+        "--batch": _handle_batch,
+        "--risk": _handle_risk,
+        "--level": _handle_level,
+    }
+
+    def _secure_sqlmap_args(self, extra_args: str) -> List[str]:
         """Apply sqlmap-specific security restrictions to arguments (ENHANCED FEATURE)."""
         if not extra_args:
-            return ""
-        
-        args = shlex.split(extra_args)
-        secured = []
+            return []
+        limits = (self.max_risk_level, self.max_test_level, self.max_threads)
+        secured, audit = self._secured_args_cache(extra_args, limits)
+        _log_audit(log, audit)
+        return list(secured)
+
+    def _build_secured_args(
+        self, extra_args: str, limits: Tuple[int, int, int]
+    ) -> Tuple[Tuple[str, ...], Tuple[_AuditEvent, ...]]:
+        """
+        Compute secured arguments for _secure_sqlmap_args.
+
+        The result depends only on extra_args and the security limits, which are
+        passed in so they form part of the cache key. Security warnings are
+        returned alongside the arguments for the caller to log per request.
+        """
+        # Intern flag-sized tokens so set/dict probes below can match by identity
+        args = [sys.intern(a) if len(a) < 32 else a for a in _split_args(extra_args)]
+        secured: List[str] = []
+        state = _SqlmapArgState()
         
-        # Track security settings
-        has_url = False
-        has_batch = False
-        risk_level = 1  # Default risk level
-        test_level = 1  # Default test level
+        # Bind per-call constants to locals for the token loop
+        handlers = self._ARG_HANDLERS
+        allowed = self._allowed_flags_set
+        takes_value = self._FLAGS_REQUIRE_VALUE
         
         # Process arguments with security restrictions
         i = 0
-        while i < len(args):
+        n = len(args)
+        while i < n:
             arg = args[i]
-            
-            # URL specification (required)
-            if arg in ("-u", "--url"):
-                if i + 1 < len(args):
-                    url = args[i + 1]
-                    if self._is_valid_url(url) and self._is_authorized_target(url):
-                        secured.extend([arg, url])
-                        has_url = True
-                    else:
-                        log.warning("sqlmap.unauthorized_url url=%s", url)
-                        # Skip this URL argument
-                        i += 2
-                        continue
-                i += 2
+            handler = handlers.get(arg)
+            if handler is not None:
+                i = handler(self, args, i, secured, state)
                 continue
             
-            # Batch mode (required for safety)
-            elif arg == "--batch":
+            # Safe flags (allow as-is), consuming a value when the flag takes one
+            if arg in allowed:
                 secured.append(arg)
-                has_batch = True
-                i += 1
-                continue
-            
-            # Risk level (restricted)
-            elif arg == "--risk":
-                if i + 1 < len(args):
-                    try:
-                        risk = int(args[i + 1])
-                        if 1 <= risk <= self.max_risk_level:
-                            secured.extend([arg, str(risk)])
-                            risk_level = risk
-                        else:
-                            log.warning("sqlmap.risk_level_restricted risk=%d max=%d", risk, self.max_risk_level)
-                            # Use maximum allowed risk level
-                            secured.extend([arg, str(self.max_risk_level)])
-                    except ValueError:
-                        # Invalid risk level, use default
-                        secured.extend([arg, "1"])
-                i += 2
-                continue
-            
-            # Test level (restricted)
-            elif arg == "--level":
-                if i + 1 < len(args):
-                    try:
-                        level = int(args[i + 1])
-                        if 1 <= level <= self.max_test_level:
-                            secured.extend([arg, str(level)])
-                            test_level = level
-                        else:
-                            log.warning("sqlmap.test_level_restricted level=%d max=%d", level, self.max_test_level)
-                            # Use maximum allowed test level
-                            secured.extend([arg, str(self.max_test_level)])
-                    except ValueError:
-                        # Invalid test level, use default
-                        secured.extend([arg, "1"])
-                i += 2
-                continue
-            
-            # Safe flags (allow as-is)
-            elif arg.startswith("-") and self._is_safe_flag(arg):
-                secured.append(arg)
-                i += 1
-                continue
-            
-            # Values for safe flags
-            elif i > 0 and args[i - 1].startswith("-") and self._is_safe_flag(args[i - 1]):
-                secured.append(arg)
-                i += 1
-                continue
+                if arg in takes_value and i + 1 < n:
+                    secured.append(args[i + 1])
+                    i += 2
+                    continue
             
-            # Skip unknown/unsafe flags
+            # Skip unknown/unsafe flags and stray values
             else:
-                log.warning("sqlmap.unsafe_flag_skipped flag=%s", arg)
-                i += 1
+                state.audit.append((logging.WARNING, "sqlmap.unsafe_flag_skipped flag=%s", (arg,)))
+            i += 1
         
         # Ensure required flags are present
-        if not has_url:
+        if not state.has_url:
+            _log_audit(log, state.audit)
             raise ValueError("SQLmap requires -u/--url pointing to an authorized target")
         
-        if not has_batch:
+        if not state.has_batch:
             # Ensure batch mode is enabled
             secured.append("--batch")
-            log.info("sqlmap.batch_mode_enforced")
+            state.audit.append((logging.INFO, "sqlmap.batch_mode_enforced", ()))
         
-        # Add safety restrictions
-        if risk_level > self.max_risk_level:
-            secured.extend(["--risk", str(self.max_risk_level)])
+        # Pin risk/level explicitly when the caller did not (values are clamped in-loop)
+        if not state.has_risk:
+            secured.append("--risk")
+            secured.append("1")
         
-        if test_level > self.max_test_level:
-            secured.extend(["--level", str(self.max_test_level)])
+        if not state.has_level:
+            secured.append("--level")
+            secured.append("1")
         
         # Add default safety options
-        secured.extend(["--technique", "BEU"])  # Basic techniques only
-        secured.extend(["--time-sec", "5"])     # Conservative timing
-        secured.extend(["--threads", "5"])       # Limited threads
+        secured += (
+            "--technique", "BEU",                 # Basic techniques only
+            "--time-sec", "5",                    # Conservative timing
+            "--threads", str(self.max_threads),   # Limited threads
+        )
         
-        return " ".join(secured)
+        return tuple(secured), tuple(state.audit)
 
-    def _parse_and_validate_args(self, secured_args: str, inp: ToolInput) -> Union[str, ToolOutput]:
-        """Validate secured arguments with base sanitizer while tolerating payload tokens."""
+    def _parse_and_validate_args(self, secured_args: Sequence[str], inp: ToolInput) -> Union[str, ToolOutput]:
+        """Validate secured argument tokens with base sanitizer while tolerating payload tokens."""
         if not secured_args:
             return ""
 
-        tokens = shlex.split(secured_args)
         placeholder_map: Dict[str, str] = {}
         sanitized_parts: List[str] = []
 
-        for idx, token in enumerate(tokens):
+        for idx, token in enumerate(secured_args):
             if self._is_base_token_allowed(token):
                 sanitized_parts.append(token)
                 continue
@@ -426,10 +510,9 @@ class SqlmapTool(MCPBaseTool):
             placeholder_map[placeholder] = token
             sanitized_parts.append(placeholder)
 
-        sanitized_string = " ".join(sanitized_parts)
-
         try:
-            base_tokens = list(super()._parse_args(sanitized_string))
+            # Tokens are already split; skip the join/re-split round trip through _parse_args
+            base_tokens = list(self._sanitize_tokens(sanitized_parts))
         except ValueError as e:
             error_context = ErrorContext(
                 error_type=ToolErrorType.VALIDATION_ERROR,
@@ -454,24 +537,20 @@ class SqlmapTool(MCPBaseTool):
         """Allow sqlmap payloads with ? and & so long as they are sanitized."""
         return bool(self._PAYLOAD_PATTERN.fullmatch(token) and ".." not in token)
     
-    def _is_safe_flag(self, flag: str) -> bool:
-        """Check if a flag is in the allowed list (ENHANCED FEATURE)."""
-        return flag in self.allowed_flags
-    
-    def _get_timestamp(self):
-        """Get current timestamp (ENHANCED HELPER)."""
-        from datetime import datetime
-        return datetime.now()
+    def _get_timestamp(self) -> datetime:
+        """Get current UTC timestamp (ENHANCED HELPER)."""
+        return datetime.now(timezone.utc)
     
-    def get_tool_info(self) -> dict:
-        """Get enhanced sqlmap tool information (ENHANCED FEATURE)."""
-        base_info = {
+    @cached_property
+    def _static_tool_info(self) -> Dict[str, Any]:
+        """Tool information derived from class constants and init-time config."""
+        return {
             "name": self.tool_name,
             "command": self.command_name,
             "description": self.__doc__,
             "concurrency": self.concurrency,
             "timeout": self.default_timeout_sec,
-            "allowed_flags": list(self.allowed_flags) if self.allowed_flags else [],
+            "allowed_flags": tuple(self.allowed_flags) if self.allowed_flags else (),
             "circuit_breaker": {
                 "failure_threshold": self.circuit_breaker_failure_threshold,
                 "recovery_timeout": self.circuit_breaker_recovery_timeout
@@ -480,23 +559,21 @@ class SqlmapTool(MCPBaseTool):
                 "max_risk_level": self.max_risk_level,
                 "max_test_level": self.max_test_level,
                 "max_threads": self.max_threads,
-                "required_modes": ["--batch"],
+                "required_modes": ("--batch",),
                 "target_validation": "RFC1918 or .lab.internal only"
             },
-            "usage_examples": [
-                {
-                    "description": "Basic SQL injection test",
-                    "command": "sqlmap -u 'http://192.168.1.10/page.php?id=1' --batch --risk=1 --level=1"
-                },
-                {
-                    "description": "Database enumeration",
-                    "command": "sqlmap -u 'http://192.168.1.10/page.php?id=1' --batch --risk=1 --level=2 --dbs"
-                },
-                {
-                    "description": "Table enumeration",
-                    "command": "sqlmap -u 'http://192.168.1.10/page.php?id=1' --batch --risk=1 --level=2 -D testdb --tables"
-                }
-            ]
+            "usage_examples": _USAGE_EXAMPLES,
+        }
+    
+    def get_tool_info(self) -> dict:
+        """Get enhanced sqlmap tool information (ENHANCED FEATURE)."""
+        static = self._static_tool_info
+        # Nested dicts are copied so callers can mutate the result without touching the cache
+        base_info = {
+            **static,
+            "circuit_breaker": dict(static["circuit_breaker"]),
+            "security_restrictions": dict(static["security_restrictions"]),
+            "usage_examples": tuple(dict(example) for example in static["usage_examples"]),
         }
         
         # Add metrics if available
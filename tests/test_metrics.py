@@ -0,0 +1,155 @@
+"""Regression tests for the metrics collection system."""
+from __future__ import annotations
+
+import pathlib
+import sys
+import threading
+
+import pytest
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from mcp_server.metrics import MetricsManager, SystemMetrics, ToolExecutionMetrics
+
+
+def test_concurrent_records_are_all_counted() -> None:
+    metrics = ToolExecutionMetrics("ConcurrentTool")
+
+    def worker() -> None:
+        for i in range(500):
+            metrics.record_execution(success=i % 5 != 0, execution_time=0.01, error_type="boom")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = metrics.get_stats()
+    assert stats["execution_count"] == 4000
+    assert stats["success_count"] == 3200
+    assert stats["failure_count"] == 800
+    assert stats["error_count"] == 800
+
+
+def test_stats_aggregate_min_max_and_percentiles() -> None:
+    metrics = ToolExecutionMetrics("TimedTool")
+    for value in (0.5, 0.1, 0.3, 0.2, float("nan")):
+        metrics.record_execution(success=True, execution_time=value)
+
+    stats = metrics.get_stats()
+    assert stats["execution_count"] == 5
+    assert stats["min_execution_time"] == 0.0
+    assert stats["max_execution_time"] == 0.5
+    assert stats["p50_execution_time"] == 0.2
+
+
+def test_recent_window_keeps_only_latest_executions() -> None:
+    metrics = ToolExecutionMetrics("WindowTool")
+    for _ in range(100):
+        metrics.record_execution(success=False, execution_time=9.0)
+    for _ in range(100):
+        metrics.record_execution(success=True, execution_time=0.2)
+
+    stats = metrics.get_stats()
+    assert stats["execution_count"] == 200
+    assert stats["recent_failure_rate"] == 0.0
+    assert stats["success_rate"] == 50.0
+    assert stats["p99_execution_time"] == 0.2
+
+
+def test_system_counts_survive_worker_thread_exit() -> None:
+    system = SystemMetrics()
+
+    def worker() -> None:
+        for i in range(1000):
+            system.increment_request_count()
+            if i % 4 == 0:
+                system.increment_error_count()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    system.increment_request_count()
+
+    stats = system.get_stats()
+    assert stats["request_count"] == 4001
+    assert stats["error_count"] == 1000
+    assert system.request_count == 4001
+
+
+def test_manager_evicts_least_recently_used_tool() -> None:
+    manager = MetricsManager.get()
+    manager.reset()
+    original_max = manager.max_tools
+    manager.max_tools = 2
+    try:
+        manager.get_tool_metrics("alpha")
+        manager.get_tool_metrics("beta")
+        manager.get_tool_metrics("alpha")
+        manager.get_tool_metrics("gamma")
+        assert list(manager.tool_metrics) == ["alpha", "gamma"]
+    finally:
+        manager.max_tools = original_max
+        manager.reset()
+
+
+def test_counters_skip_percentile_fields() -> None:
+    metrics = ToolExecutionMetrics("CounterTool")
+    metrics.record_execution(success=True, execution_time=0.4)
+    metrics.record_execution(success=False, execution_time=0.2, error_type="boom")
+
+    counters = metrics.get_counters()
+    assert counters["execution_count"] == 2
+    assert counters["error_count"] == 1
+    assert counters["average_execution_time"] == pytest.approx(0.3)
+    assert "p50_execution_time" not in counters
+    assert set(metrics.get_percentiles()) == {"p50_execution_time", "p95_execution_time", "p99_execution_time"}
+
+
+def test_prometheus_flusher_counts_drops_and_survives_bad_entries(monkeypatch: pytest.MonkeyPatch) -> None:
+    from mcp_server import metrics as metrics_module
+
+    flusher = metrics_module._PrometheusFlusher()
+    monkeypatch.setattr(flusher, "_start", lambda: None)
+    monkeypatch.setattr(metrics_module, "_PROMETHEUS_BUFFER_SIZE", 2)
+
+    class BrokenHistogram:
+        def observe(self, value: float) -> None:
+            raise RuntimeError("boom")
+
+    tool = metrics_module.ToolMetrics("flusher-test")
+    tool._hist_child = BrokenHistogram()
+    for _ in range(3):
+        flusher.submit(tool, metrics_module._STATUS_SUCCESS, metrics_module._ERR_NONE, 0.1, True)
+    assert flusher.dropped == 1
+
+    flusher.flush()
+    assert not flusher._pending
+    if metrics_module._EXEC_COUNTER is not None:
+        child = tool._counter_child(metrics_module._STATUS_SUCCESS, metrics_module._ERR_NONE)
+        assert child._value.get() == 2
+
+
+def test_batched_percentiles_match_per_tool_stats() -> None:
+    manager = MetricsManager.get()
+    manager.reset()
+    try:
+        full = manager.get_tool_metrics("full-window")
+        partial = manager.get_tool_metrics("partial-window")
+        for i in range(150):
+            full.metrics.record_execution(success=True, execution_time=i / 100)
+        for i in range(10):
+            partial.metrics.record_execution(success=True, execution_time=i / 10)
+
+        tools = manager.get_all_stats()["tools"]
+        for name, metrics in (("full-window", full), ("partial-window", partial)):
+            expected = metrics.metrics.get_stats()
+            for key in ("p50_execution_time", "p95_execution_time", "p99_execution_time"):
+                assert tools[name][key] == expected[key]
+    finally:
+        manager.reset()
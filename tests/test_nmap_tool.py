@@ -7,10 +7,11 @@ PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from mcp_server.tools.nmap_tool import NmapTool
+from mcp_server.base_tool import ErrorContext, ToolErrorType, ToolInput, ToolOutput, _is_private_or_lab
+from mcp_server.tools.nmap_tool import _DEFAULT_OPTIMIZED_ARGS, NmapTool, _is_private_v4
 
 
-def run_tool(extra_args: str) -> tuple[NmapTool, str, str]:
+def run_tool(extra_args: str) -> tuple[NmapTool, list[str], list[str]]:
     tool = NmapTool()
     validated = tool._parse_and_validate_args(extra_args)  # type: ignore[attr-defined]
     optimized = tool._optimize_nmap_args(validated)
@@ -19,31 +20,213 @@ def run_tool(extra_args: str) -> tuple[NmapTool, str, str]:
 
 def test_allows_user_os_detection_flag():
     _, validated, optimized = run_tool("-O")
-    assert "-O" in validated.split()
-    assert "-O" in optimized.split()
+    assert "-O" in validated
+    assert "-O" in optimized
 
 
 def test_optimizer_defaults_are_permitted():
     _, validated, optimized = run_tool("")
-    # Validation step should succeed (may return empty string)
-    assert validated == ""
-    tokens = optimized.split()
+    # Validation step should succeed (may return no tokens)
+    assert validated == []
+    tokens = optimized
     assert "-T4" in tokens
     assert "--max-parallelism" in tokens
     assert "10" in tokens
     assert "-Pn" in tokens
     assert "--top-ports" in tokens
     assert "1000" in tokens
+    # _execute_tool short-circuits empty args to this precomputed string
+    assert " ".join(optimized) == _DEFAULT_OPTIMIZED_ARGS
 
 
 def test_combined_user_and_defaults():
     _, validated, optimized = run_tool("-O --max-parallelism 20")
-    validated_tokens = validated.split()
+    validated_tokens = validated
     assert "--max-parallelism" in validated_tokens
     assert "20" in validated_tokens
     assert "-O" in validated_tokens
 
-    optimized_tokens = optimized.split()
+    optimized_tokens = optimized
     assert optimized_tokens.count("--max-parallelism") == 1
     assert "20" in optimized_tokens
     assert "-O" in optimized_tokens
+
+
+def test_optimizer_returns_input_when_nothing_to_inject():
+    tool = NmapTool()
+    tokens = ["-T3", "--max-parallelism", "5", "-sn", "-p", "22,80"]
+    assert tool._optimize_nmap_args(tokens) is tokens
+
+
+def test_aggressive_scan_is_throttled():
+    tool = NmapTool()
+    tokens = tool._optimize_nmap_args(["-A", "-T5"])
+    assert "-T3" in tokens and "-T5" not in tokens
+    assert "--top-ports" not in tokens
+    assert tokens[tokens.index("--max-parallelism") + 1] == "5"
+
+
+def test_final_args_are_cached_and_reset_on_config_reload():
+    tool = NmapTool()
+    first = tool._final_args_cache("-sV -p 80", tool.allow_intrusive)
+    assert tool._final_args_cache("-sV -p 80", tool.allow_intrusive) is first
+    assert tool._final_args_cache.cache_info().hits == 1
+
+    tool._apply_config()
+    assert tool._final_args_cache.cache_info().currsize == 0
+
+
+def test_error_context_timestamp_is_materialized_lazily():
+    ctx = ErrorContext(
+        error_type=ToolErrorType.VALIDATION_ERROR,
+        message="bad target",
+        recovery_suggestion="fix it",
+        tool_name="NmapTool",
+        target="8.8.8.8",
+    )
+    assert ctx.timestamp is None
+    stamp = ctx.get_timestamp()
+    assert stamp.tzinfo is not None
+    assert ctx.get_timestamp() is stamp
+
+    output = NmapTool()._create_error_output(ctx, "c")
+    assert output.metadata["timestamp"] == stamp.isoformat()
+
+
+@pytest.mark.asyncio
+async def test_target_list_runs_once_via_input_file(monkeypatch: pytest.MonkeyPatch) -> None:
+    tool = NmapTool()
+    seen = {}
+
+    async def fake_spawn(cmd, timeout_sec):
+        seen["cmd"] = list(cmd)
+        with open(cmd[-1]) as handle:
+            seen["hosts"] = handle.read().split()
+        return ToolOutput(stdout="", stderr="", returncode=0)
+
+    monkeypatch.setattr(tool, "_spawn", fake_spawn)
+    monkeypatch.setattr(tool, "_resolve_command", lambda: "/usr/bin/nmap")
+
+    # A real ToolInput: target lists are part of the input contract, not just nmap's
+    inp = ToolInput(target="192.168.0.1, 192.168.0.2\n192.168.0.1", correlation_id="batch")
+    output = await tool._execute_tool(inp, None)
+    assert output.returncode == 0
+    assert seen["cmd"][-2] == "-iL"
+    assert seen["hosts"] == ["192.168.0.1", "192.168.0.2"]
+    assert "192.168.0.1" not in seen["cmd"]
+    assert not pathlib.Path(seen["cmd"][-1]).exists()
+
+
+def test_target_list_validates_every_host(make_input, assert_validation_error) -> None:
+    tool = NmapTool()
+    output = tool._validate_nmap_requirements(make_input(target="192.168.0.1,8.8.8.8"))
+    assert_validation_error(output, "8.8.8.8")
+
+
+def test_integer_private_check_matches_ipaddress() -> None:
+    import ipaddress
+
+    for spec in ("10.0.0.0/8", "10.0.0.0/7", "172.16.0.0/12", "172.0.0.0/11", "172.31.255.1/32",
+                 "172.32.0.0/16", "192.168.4.0/24", "192.169.0.0/16", "127.0.0.1/32", "11.0.0.0/8"):
+        network = ipaddress.ip_network(spec)
+        expected = network.is_private or network.is_loopback
+        assert _is_private_v4(int(network.network_address), network.prefixlen) == expected, spec
+
+
+def test_target_list_total_address_count_is_capped(make_input, assert_validation_error) -> None:
+    tool = NmapTool()
+    subnets = ",".join(f"10.{i}.0.0/22" for i in range(64))
+    assert_validation_error(
+        tool._validate_nmap_requirements(make_input(target=subnets)), "Target list too large"
+    )
+    assert_validation_error(
+        tool._validate_nmap_requirements(make_input(target="10.0.0.0/21")), "Network range too large"
+    )
+    # Overlapping entries are only counted once
+    assert tool._validate_nmap_requirements(make_input(target="10.0.0.0/22,10.0.1.0/24,10.0.2.5")) is None
+
+
+def test_apply_config_picks_up_in_place_policy_changes(monkeypatch: pytest.MonkeyPatch) -> None:
+    tool = NmapTool()
+    monkeypatch.setattr(tool.config.security, "allow_intrusive", True)
+    tool._apply_config()
+    assert tool.allow_intrusive
+    assert "-A" in tool.allowed_flags
+
+
+@pytest.mark.asyncio
+async def test_blocked_scripts_are_logged_on_every_cached_request(
+    tool_runtime_stub, make_input, caplog: pytest.LogCaptureFixture
+) -> None:
+    tool = tool_runtime_stub(NmapTool())
+    inp = make_input(target="192.168.0.1", extra_args="--script vuln,http-title")
+    with caplog.at_level("WARNING", logger="mcp_server.tools.nmap_tool"):
+        for _ in range(2):
+            await tool._execute_tool(inp, None)
+    assert tool._final_args_cache.cache_info().hits == 1
+    blocked = [r for r in caplog.records if "intrusive_script_blocked" in r.getMessage()]
+    assert len(blocked) == 2
+
+
+def test_tool_info_mutation_does_not_leak_into_cache() -> None:
+    tool = NmapTool()
+    info = tool.get_tool_info()
+    info["safety_limits"]["max_network_size"] = 1 << 24
+    info["optimizations"].clear()
+    fresh = tool.get_tool_info()
+    assert fresh["safety_limits"]["max_network_size"] == tool.MAX_NETWORK_SIZE
+    assert fresh["optimizations"]
+
+
+def test_target_list_contract_checks_every_entry() -> None:
+    assert _is_private_or_lab("192.168.0.1, 10.0.0.0/24 db.lab.internal")
+    assert not _is_private_or_lab("192.168.0.1,8.8.8.8")
+    assert not _is_private_or_lab(",")
+    assert _is_private_or_lab("192.168.0.1")
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("10", True),
+        ("10ms", True),
+        ("10s", True),
+        ("10m", True),
+        ("ms", False),
+        ("10sm", False),
+        ("10h", False),
+        ("10\n", False),
+        ("１", False),
+        ("", False),
+    ],
+)
+def test_duration_value_validation(value: str, expected: bool) -> None:
+    assert NmapTool()._validate_numeric_value("--host-timeout", value) is expected
+
+
+def test_numeric_value_validation_is_ascii_only() -> None:
+    tool = NmapTool()
+    assert tool._validate_numeric_value("--min-rate", "100")
+    assert not tool._validate_numeric_value("--min-rate", "１０")
+    assert not tool._validate_numeric_value("--min-rate", "10s")
+    assert not tool._validate_numeric_value("--unknown", "10")
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("80", True),
+        ("80,443", True),
+        ("1-1000", True),
+        ("80,443,8000-8100", True),
+        ("0", False),
+        ("65536", False),
+        ("443-80", False),
+        ("1-2-3", False),
+        ("80,", False),
+        ("80;443", False),
+        ("８０", False),
+    ],
+)
+def test_port_specification_validation(spec: str, expected: bool) -> None:
+    assert NmapTool()._validate_port_specification(spec) is expected
@@ -69,3 +69,100 @@ def test_invalid_payload_token_rejected(tool: SqlmapTool, make_input, assert_val
         make_input(target="http://192.168.0.5/item?id=1"),
     )
     assert_validation_error(output, "Unsupported sqlmap payload token")
+
+
+def test_batch_flag_not_duplicated(tool: SqlmapTool) -> None:
+    secured = tool._secure_sqlmap_args("-u http://192.168.0.5/item?id=1 --batch")
+    assert secured.count("--batch") == 1
+
+
+def test_secured_args_cache_returns_fresh_lists(tool: SqlmapTool) -> None:
+    payload = "-u http://192.168.0.5/item?id=1 --batch --level 2"
+    first = tool._secure_sqlmap_args(payload)
+    first.append("--mutated")
+    second = tool._secure_sqlmap_args(payload)
+    assert "--mutated" not in second
+    assert tool._secured_args_cache.cache_info().hits == 1
+
+
+def test_security_warnings_repeat_on_cache_hits(tool: SqlmapTool, caplog: pytest.LogCaptureFixture) -> None:
+    payload = "-u http://192.168.0.5/item?id=1 --url http://8.8.8.8/x --batch"
+    with caplog.at_level("WARNING", logger="mcp_server.tools.sqlmap_tool"):
+        tool._secure_sqlmap_args(payload)
+        tool._secure_sqlmap_args(payload)
+    assert tool._secured_args_cache.cache_info().hits == 1
+    unauthorized = [r for r in caplog.records if "sqlmap.unauthorized_url" in r.getMessage()]
+    assert len(unauthorized) == 2
+
+
+def test_tool_info_mutation_does_not_leak_into_cache(tool: SqlmapTool) -> None:
+    info = tool.get_tool_info()
+    info["security_restrictions"]["max_risk_level"] = 99
+    info["usage_examples"][0]["command"] = "rm -rf /"
+    fresh = tool.get_tool_info()
+    assert fresh["security_restrictions"]["max_risk_level"] == tool.max_risk_level
+    assert fresh["usage_examples"][0]["command"].startswith("sqlmap ")
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://10.0.0.5/item?id=1",
+        "http://172.16.4.2/item?id=1",
+        "http://172.31.255.254/item?id=1",
+        "http://192.168.1.10:8080/item?id=1",
+        "http://app.lab.internal/item?id=1",
+    ],
+)
+def test_authorized_target_accepts_private_ranges(tool: SqlmapTool, url: str) -> None:
+    assert tool._is_authorized_target(url)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://127.0.0.1/item?id=1",
+        "http://169.254.10.1/item?id=1",
+        "http://172.32.0.1/item?id=1",
+        "http://8.8.8.8/item?id=1",
+        # 256 matches the dotted-quad pattern but is not a valid octet
+        "http://10.0.0.256/item?id=1",
+        # Leading zeros skip the fast path and are rejected by ipaddress
+        "http://10.0.0.01/item?id=1",
+        "http://010.0.0.1/item?id=1",
+        # IPv6 falls through to ipaddress and is never authorized
+        "http://[fd00::1]/item?id=1",
+        "http://[::1]/item?id=1",
+        "http://example.com/item?id=1",
+    ],
+)
+def test_authorized_target_rejects_other_hosts(tool: SqlmapTool, url: str) -> None:
+    assert not tool._is_authorized_target(url)
+
+
+def test_valid_url_rejects_overlong_and_dot_flooded_urls(tool: SqlmapTool) -> None:
+    base = "http://192.168.0.5/item?id="
+    assert tool._is_valid_url(base + "1" * (2048 - len(base)))
+    assert not tool._is_valid_url(base + "1" * (2049 - len(base)))
+    assert tool._is_valid_url("http://192.168.0.5/" + "a." * 13)
+    assert not tool._is_valid_url("http://192.168.0.5/" + "a." * 14)
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "javascript:alert(1)",
+        "file:///etc/passwd",
+        "ftp://192.168.0.5/item",
+        "data:text/html,<script>",
+        # Unbalanced IPv6 bracket: urlparse raises, _parse_url_cached returns None
+        "http://[fd00::1/item?id=1",
+    ],
+)
+def test_valid_url_rejects_bad_schemes_and_unparsable_urls(tool: SqlmapTool, url: str) -> None:
+    assert not tool._is_valid_url(url)
+
+
+def test_valid_url_scheme_check_is_case_insensitive(tool: SqlmapTool) -> None:
+    assert tool._is_valid_url("HTTP://192.168.0.5/item?id=1")
+    assert tool._is_valid_url("HttpS://192.168.0.5/item?id=1")